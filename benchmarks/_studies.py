@@ -0,0 +1,45 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Synthetic studies shared by the benchmarks."""
+
+import optuna
+
+
+def make_trials(n_trials, n_objectives=1):
+    """Returns `n_trials` complete trials with a float, an int and a categorical param and 3 intermediate values."""
+    distributions = {
+        'x': optuna.distributions.UniformDistribution(-5, 5),
+        'y': optuna.distributions.IntUniformDistribution(0, 100),
+        'c': optuna.distributions.CategoricalDistribution(['a', 'b', 'c']),
+    }
+    trials = []
+    for number in range(n_trials):
+        params = {'x': (number * 7919 % 1000) / 100 - 5, 'y': number * 31 % 101, 'c': 'abc'[number % 3]}
+        values = [params['x'] ** 2 + params['y'] + objective for objective in range(n_objectives)]
+        trials.append(optuna.trial.create_trial(
+            params=params,
+            distributions=distributions,
+            values=values,
+            intermediate_values={step: values[0] + 10 - step for step in range(3)},
+        ))
+    return trials
+
+
+def make_study(n_trials, n_objectives=1):
+    study = optuna.create_study(directions=['minimize'] * n_objectives)
+    study.add_trials(make_trials(n_trials, n_objectives))
+    return study
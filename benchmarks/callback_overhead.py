@@ -0,0 +1,130 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures how the cost of `NeptuneCallback.__call__` grows with the size of the study.
+
+For every study size, number of objectives, and with plots and study snapshots on or off, the study is filled with
+`size` trials and the callback is then timed on `--calls` more. Nothing is sent anywhere: the callback logs to an
+`RecordingRun`, which counts the operations and the bytes it is given.
+
+Pass `--dump DIR` to also write what was logged for every case, and the per-namespace accounting, to `DIR`.
+
+    python benchmarks/callback_overhead.py --sizes 100 1000 --output callback_overhead.json
+
+The results are written as JSON so that runs of different versions can be compared.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import warnings
+
+import optuna
+
+import neptune_optuna
+from neptune_optuna.impl import NeptuneCallback, RecordingRun
+
+from _studies import make_trials
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+
+def run_case(trials, size, calls, n_objectives, plots, snapshots, dump=None):
+    study = optuna.create_study(directions=['minimize'] * n_objectives)
+    study.add_trials(trials[:size])
+
+    run = RecordingRun()
+    callback = NeptuneCallback(
+        run,
+        plots_update_freq=1 if plots else 'never',
+        study_update_freq=1 if snapshots else 'never',
+        # fANOVA does not finish in reasonable time on the largest studies
+        importance_evaluator=optuna.importance.MeanDecreaseImpurityImportanceEvaluator(),
+    )
+
+    seconds = []
+    before = run.total()
+    for trial in trials[size:size + calls]:
+        study.add_trial(trial)
+        frozen = study.get_trials(deepcopy=False)[-1]
+        start = time.perf_counter()
+        callback(study, frozen)
+        seconds.append(time.perf_counter() - start)
+    callback.close()
+    after = run.total()
+    if dump is not None:
+        run.dump(os.path.join(dump, f'{size}-{n_objectives}obj-plots{int(plots)}-snapshots{int(snapshots)}'))
+
+    seconds.sort()
+    return {
+        'size': size,
+        'objectives': n_objectives,
+        'plots': plots,
+        'snapshots': snapshots,
+        'calls': len(seconds),
+        'mean_seconds': statistics.mean(seconds),
+        'median_seconds': statistics.median(seconds),
+        'p95_seconds': seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))],
+        'max_seconds': seconds[-1],
+        'operations_per_trial': (after['operations'] - before['operations']) / len(seconds),
+        'bytes_per_trial': (after['bytes'] - before['bytes']) / len(seconds),
+        'bytes_per_namespace': {namespace: stats['bytes'] for namespace, stats in run.stats(depth=1).items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--calls', type=int, default=10, help='number of timed callback calls per case')
+    parser.add_argument('--objectives', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--no-plots', action='store_true', help='skip the cases that log plots')
+    parser.add_argument('--output', default='callback_overhead.json')
+    parser.add_argument('--dump', default=None, help='directory to dump the logged metadata of every case to')
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    cases = []
+    for n_objectives in args.objectives:
+        trials = make_trials(max(args.sizes) + args.calls, n_objectives)
+        for size, plots, snapshots in itertools.product(sorted(args.sizes), (False, True), (False, True)):
+            if plots and args.no_plots:
+                continue
+            case = run_case(trials, size, args.calls, n_objectives, plots, snapshots, args.dump)
+            print(json.dumps(case), file=sys.stderr)
+            cases.append(case)
+
+    result = {
+        'benchmark': 'callback_overhead',
+        'created': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'optuna': optuna.__version__,
+        'neptune_optuna': neptune_optuna.__version__,
+        'cases': cases,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Checks that `NeptuneCallback` logs every trial once when `study.optimize(n_jobs>1)` calls it from many threads.
+
+The callback logs to a `RecordingRun`, with `_process` wrapped to record the trials of every call and whether
+two calls ever overlapped. It is run without `async_mode`, where the calling threads hand the logging over to
+each other, and with `async_mode` and a small queue for every backpressure policy that keeps all trials.
+
+Fails (exit code 1) when a trial is logged more than once or not at all, `_process` ran twice at the same time,
+or 'best/value' is not the best value of the study:
+
+    python benchmarks/concurrent_callback.py --trials 200 --jobs 16
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+import warnings
+
+import optuna
+
+from neptune_optuna.impl import NeptuneCallback, RecordingRun
+
+CASES = {
+    'threads': {},
+    'async_block': {'async_mode': True, 'max_queue_size': 2, 'backpressure': 'block'},
+    'async_coalesce': {'async_mode': True, 'max_queue_size': 2, 'backpressure': 'coalesce'},
+}
+
+
+def objective(trial):
+    x = trial.suggest_float('x', -5, 5)
+    time.sleep(random.random() / 100)
+    return x ** 2
+
+
+def run_case(options, n_trials, n_jobs):
+    run = RecordingRun()
+    callback = NeptuneCallback(run, plots_update_freq='never', study_update_freq='never', **options)
+
+    process = callback._process
+    lock = threading.Lock()
+    active, overlaps, logged, calls = [0], [0], [], [0]
+
+    def recorded_process(study, trials):
+        with lock:
+            active[0] += 1
+            overlaps[0] += active[0] > 1
+            calls[0] += 1
+            logged.extend(trial.number for trial in trials)
+        try:
+            # widen the window in which another thread could enter
+            time.sleep(0.001)
+            return process(study, trials)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    callback._process = recorded_process
+    if callback._worker is not None:
+        # the async worker was handed the method before it was wrapped
+        callback._worker._handler = recorded_process
+    study = optuna.create_study()
+    study.optimize(objective, n_trials=n_trials, n_jobs=n_jobs, callbacks=[callback])
+    callback.close()
+
+    logged_trial_ids = {path.split('/')[2] for path in run._attributes if path.startswith('trials/trials/')}
+    return {
+        'trials': len(study.trials),
+        'process_calls': calls[0],
+        'overlaps': overlaps[0],
+        'logged_once': sorted(logged) == [trial.number for trial in study.trials],
+        'all_trials_in_run': logged_trial_ids == {str(trial._trial_id) for trial in study.trials},
+        'best_value_matches': run['best/value'].fetch() == study.best_value,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    # n_jobs is deprecated in favour of several processes, which do not share a callback
+    warnings.simplefilter('ignore', FutureWarning)
+    random.seed(args.seed)
+    failed = False
+    for name, options in CASES.items():
+        case = run_case(options, args.trials, args.jobs)
+        print(name, case, file=sys.stderr)
+        failed = failed or case['overlaps'] or not (case['logged_once'] and case['all_trials_in_run']
+                                                    and case['best_value_matches'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
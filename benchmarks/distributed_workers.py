@@ -0,0 +1,139 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures what several processes optimizing one SQLite study log to one run, with and without coordination.
+
+Every worker process loads the study from a temporary SQLite database and logs to its own `RecordingRun` with the
+same 'sys/id', as if they all had opened the same run with `with_id`. The operations of all workers are added up
+per namespace.
+
+Fails (exit code 1) when, with `coordinate_workers=True`, a trial is logged more than once or not at all,
+or no worker has logged the best value of the study:
+
+    python benchmarks/distributed_workers.py --workers 4 --trials 20
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import warnings
+
+import optuna
+
+import neptune_optuna
+from neptune_optuna.impl import NeptuneCallback, RecordingRun
+
+RUN_ID = 'DISTRIBUTED-1'
+
+
+def objective(trial):
+    x = trial.suggest_float('x', -5, 5)
+    y = trial.suggest_int('y', 0, 100)
+    return x ** 2 + y
+
+
+def worker(storage, n_trials, coordinate, output):
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    study = optuna.load_study(study_name='distributed', storage=storage)
+    run = RecordingRun(run_id=RUN_ID)
+    callback = NeptuneCallback(
+        run,
+        coordinate_workers=coordinate,
+        importance_evaluator=optuna.importance.MeanDecreaseImpurityImportanceEvaluator(),
+    )
+    study.optimize(objective, n_trials=n_trials, callbacks=[callback])
+    callback.close()
+
+    trial_numbers = sorted({int(path.split('/')[2]) for path in run._attributes if path.startswith('trials/trials/')})
+    best_value = run['best/value'].fetch() if run.exists('best/value') else None
+    output.put({
+        'trial_numbers': trial_numbers,
+        'best_value': best_value,
+        'operations': {namespace: stats['operations'] for namespace, stats in run.stats(depth=1).items()},
+        'bytes': run.total()['bytes'],
+    })
+
+
+def run_case(n_workers, n_trials, coordinate):
+    with tempfile.TemporaryDirectory() as directory:
+        storage = f"sqlite:///{os.path.join(directory, 'study.db')}"
+        study = optuna.create_study(study_name='distributed', storage=storage)
+        output = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(storage, n_trials, coordinate, output))
+                     for _ in range(n_workers)]
+        for process in processes:
+            process.start()
+        results = [output.get() for _ in processes]
+        for process in processes:
+            process.join()
+        best_value = study.best_value
+        n_study_trials = len(study.trials)
+
+    logged = [number for result in results for number in result['trial_numbers']]
+    operations = {}
+    for result in results:
+        for namespace, count in result['operations'].items():
+            operations[namespace] = operations.get(namespace, 0) + count
+    return {
+        'workers': n_workers,
+        'trials': n_study_trials,
+        'coordinate_workers': coordinate,
+        'trials_logged': len(logged),
+        'unique_trials_logged': len(set(logged)),
+        'workers_refreshing': sum(result['best_value'] is not None for result in results),
+        'best_value_matches': any(result['best_value'] == best_value for result in results),
+        'operations': operations,
+        'bytes': sum(result['bytes'] for result in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trials', type=int, default=20, help='number of trials per worker')
+    parser.add_argument('--output', default='distributed_workers.json')
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    cases = [run_case(args.workers, args.trials, coordinate) for coordinate in (False, True)]
+    for case in cases:
+        print(json.dumps(case), file=sys.stderr)
+
+    result = {
+        'benchmark': 'distributed_workers',
+        'created': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'optuna': optuna.__version__,
+        'neptune_optuna': neptune_optuna.__version__,
+        'cases': cases,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    coordinated = cases[-1]
+    failed = coordinated['trials_logged'] != coordinated['trials'] \
+        or coordinated['unique_trials_logged'] != coordinated['trials'] or not coordinated['best_value_matches']
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
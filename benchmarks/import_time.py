@@ -0,0 +1,74 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures how long `import neptune_optuna.impl` takes in a fresh interpreter.
+
+Fails (exit code 1) when the import pulls in one of the heavy dependencies or gets slower than `--max-seconds`,
+so it can guard against regressions in CI:
+
+    python benchmarks/import_time.py --repeat 10 --max-seconds 0.5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('neptune', 'optuna', 'plotly', 'sqlalchemy', 'numpy', 'pandas', 'sklearn')
+
+_SNIPPET = '''
+import json, sys, time
+start = time.perf_counter()
+import neptune_optuna.impl
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': [name for name in %r if name in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+
+def measure_once():
+    output = subprocess.run([sys.executable, '-c', _SNIPPET], check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    samples = [measure_once() for _ in range(args.repeat)]
+    seconds = [sample['seconds'] for sample in samples]
+    loaded = sorted({name for sample in samples for name in sample['loaded']})
+    result = {
+        'benchmark': 'import_time',
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'median_seconds': statistics.median(seconds),
+        'min_seconds': min(seconds),
+        'max_seconds': max(seconds),
+        'heavy_modules_loaded': loaded,
+    }
+    print(json.dumps(result, indent=2))
+
+    failed = bool(loaded)
+    if args.max_seconds is not None and result['median_seconds'] > args.max_seconds:
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Checks that a study logged with `study_snapshot='incremental'` is loaded back mid-sweep with its trial numbers.
+
+Trials are asked for and told in an interleaved order, so that trials are still running when later ones finish,
+and after every finished trial the study is loaded from the `RecordingRun` it is logged to. Every load has to
+return the trials of the study at that point, with the same numbers, states and values.
+
+Fails (exit code 1) when a load differs from the study:
+
+    python benchmarks/incremental_reload.py --trials 50 --parallel 4
+"""
+
+import argparse
+import random
+import sys
+import warnings
+
+import optuna
+
+from neptune_optuna.impl import NeptuneCallback, RecordingRun, load_study_from_run
+
+
+def _summary(study):
+    return [(trial.number, trial.state, trial.values) for trial in study.get_trials(deepcopy=False)]
+
+
+def run_case(n_trials, parallel, compaction_freq, seed):
+    rng = random.Random(seed)
+    run = RecordingRun()
+    callback = NeptuneCallback(run, plots_update_freq='never', study_snapshot='incremental',
+                               study_compaction_freq=compaction_freq,
+                               importance_evaluator=optuna.importance.MeanDecreaseImpurityImportanceEvaluator())
+    study = optuna.create_study()
+    running, asked, mismatches = [], 0, []
+    while running or asked < n_trials:
+        while asked < n_trials and len(running) < parallel:
+            running.append(study.ask())
+            asked += 1
+        trial = running.pop(rng.randrange(len(running)))
+        study.tell(trial, trial.suggest_float('x', -5, 5) ** 2)
+        callback(study, study.trials[trial.number])
+
+        loaded = load_study_from_run(run)
+        if _summary(loaded) != _summary(study):
+            mismatches.append(trial.number)
+    return {'trials': n_trials, 'parallel': parallel, 'compaction_freq': compaction_freq, 'mismatches': mismatches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=50)
+    parser.add_argument('--parallel', type=int, default=4, help='number of trials running at the same time')
+    parser.add_argument('--compaction-freq', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    case = run_case(args.trials, args.parallel, args.compaction_freq, args.seed)
+    print(case, file=sys.stderr)
+    return 1 if case['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compares reading all trials of an RDB study with `study.trials` and with the pages read by the integration.
+
+The study is written straight into the tables of a temporary SQLite database, with a float, an int and
+a categorical param, a value, 3 intermediate values and a user attribute per trial, so that large studies are
+quick to set up. Every reader then reads it on a freshly loaded study:
+
+* `study_trials`: `study.trials`, through the ORM and with a deep copy of every trial
+* `orm_pages`: pages of ORM objects with their relationships loaded by `selectinload`, as before the SQL reader
+* `sql_pages`: the id-ranged set-based queries of `_RDBTrialReader`, as used by `log_study_metadata`
+
+Fails (exit code 1) when the trials read by the pages differ from `study.trials`, or when `sql_pages` is less than
+`--min-speedup` times faster than `study_trials`:
+
+    python benchmarks/rdb_trial_reader.py --sizes 10000 100000 --min-speedup 10
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+
+import optuna
+
+import neptune_optuna
+from neptune_optuna.impl import TRIALS_CHUNK_SIZE, _iter_trials
+
+DEFAULT_SIZES = (10000, 100000)
+
+
+def fill_study(storage, study_id, n_trials):
+    from optuna.distributions import distribution_to_json
+    from optuna.storages._rdb import models
+
+    distributions = {
+        'x': optuna.distributions.UniformDistribution(-5, 5),
+        'y': optuna.distributions.IntUniformDistribution(0, 100),
+        'c': optuna.distributions.CategoricalDistribution(['a', 'b', 'c']),
+    }
+    distributions_json = {name: distribution_to_json(distribution) for name, distribution in distributions.items()}
+    start = datetime.datetime(2021, 1, 1)
+
+    trials, params, values, intermediate_values, user_attrs = [], [], [], [], []
+    for number in range(n_trials):
+        trial_id = number + 1
+        trials.append({'trial_id': trial_id, 'number': number, 'study_id': study_id,
+                       'state': optuna.trial.TrialState.COMPLETE,
+                       'datetime_start': start + datetime.timedelta(seconds=number),
+                       'datetime_complete': start + datetime.timedelta(seconds=number + 1)})
+        x, y, c = (number * 7919 % 1000) / 100 - 5, number * 31 % 101, number % 3
+        for name, value in (('x', x), ('y', y), ('c', c)):
+            params.append({'trial_id': trial_id, 'param_name': name, 'param_value': value,
+                           'distribution_json': distributions_json[name]})
+        values.append({'trial_id': trial_id, 'objective': 0, 'value': x ** 2 + y})
+        for step in range(3):
+            intermediate_values.append({'trial_id': trial_id, 'step': step, 'intermediate_value': x ** 2 + y - step})
+        user_attrs.append({'trial_id': trial_id, 'key': 'fold', 'value_json': json.dumps(number % 5)})
+
+    with storage.engine.begin() as connection:
+        for model, rows in ((models.TrialModel, trials), (models.TrialParamModel, params),
+                            (models.TrialValueModel, values), (models.TrialIntermediateValueModel, intermediate_values),
+                            (models.TrialUserAttributeModel, user_attrs)):
+            connection.execute(model.__table__.insert(), rows)
+
+
+def read_study_trials(study):
+    return study.trials
+
+
+def read_orm_pages(study, chunk_size):
+    from sqlalchemy import orm
+    from optuna.storages._rdb import models
+    from optuna.storages._rdb.storage import _create_scoped_session
+
+    storage = study._storage._backend
+    trials, last_trial_id = [], -1
+    while True:
+        with _create_scoped_session(storage.scoped_session) as session:
+            trial_models = (
+                session.query(models.TrialModel)
+                .options(orm.selectinload(models.TrialModel.params))
+                .options(orm.selectinload(models.TrialModel.values))
+                .options(orm.selectinload(models.TrialModel.user_attributes))
+                .options(orm.selectinload(models.TrialModel.system_attributes))
+                .options(orm.selectinload(models.TrialModel.intermediate_values))
+                .filter(models.TrialModel.study_id == study._study_id, models.TrialModel.trial_id > last_trial_id)
+                .order_by(models.TrialModel.trial_id)
+                .limit(chunk_size)
+                .all()
+            )
+            page = [storage._build_frozen_trial_from_trial_model(trial) for trial in trial_models]
+        if not page:
+            return trials
+        trials.extend(page)
+        last_trial_id = page[-1]._trial_id
+
+
+def read_sql_pages(study, chunk_size):
+    return [trial for chunk in _iter_trials(study, chunk_size) for trial in chunk]
+
+
+def run_case(size, chunk_size):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'study.db')}"
+        study = optuna.create_study(study_name='reader', storage=url)
+        fill_study(study._storage._backend, study._study_id, size)
+
+        case = {'size': size, 'chunk_size': chunk_size}
+        results = {}
+        for name, read in (('study_trials', read_study_trials),
+                           ('orm_pages', lambda s: read_orm_pages(s, chunk_size)),
+                           ('sql_pages', lambda s: read_sql_pages(s, chunk_size))):
+            # a fresh study, so that no reader benefits from the trials cached by another one
+            fresh = optuna.load_study(study_name='reader', storage=url)
+            start = time.perf_counter()
+            results[name] = read(fresh)
+            case[f'{name}_seconds'] = time.perf_counter() - start
+        case['speedup'] = case['study_trials_seconds'] / case['sql_pages_seconds']
+        case['equal'] = all(results[name] == results['study_trials'] for name in ('orm_pages', 'sql_pages'))
+    return case
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--chunk-size', type=int, default=TRIALS_CHUNK_SIZE)
+    parser.add_argument('--min-speedup', type=float, default=None)
+    parser.add_argument('--output', default='rdb_trial_reader.json')
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    cases = []
+    for size in sorted(args.sizes):
+        case = run_case(size, args.chunk_size)
+        print(json.dumps(case), file=sys.stderr)
+        cases.append(case)
+
+    result = {
+        'benchmark': 'rdb_trial_reader',
+        'created': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'optuna': optuna.__version__,
+        'neptune_optuna': neptune_optuna.__version__,
+        'cases': cases,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    failed = not all(case['equal'] for case in cases)
+    if args.min_speedup is not None:
+        failed = failed or any(case['speedup'] < args.min_speedup for case in cases)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
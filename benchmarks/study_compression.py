@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Shows the size versus CPU trade-off of compressing study snapshots and of pickle protocol 5.
+
+Every study snapshot format, compression and level is encoded as `_log_study` uploads it and decoded as
+`load_study_from_run` reads it:
+
+    python benchmarks/study_compression.py --sizes 10000 100000 --output study_compression.json
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+import warnings
+
+import optuna
+
+from neptune_optuna.impl import (
+    _artifact_encoding,
+    _decode_artifact,
+    _dump_pickle,
+    _encode_artifact,
+    _study_from_columnar,
+    _study_to_columnar,
+)
+
+from _studies import make_study
+
+DEFAULT_SIZES = (10000, 100000)
+
+COMPRESSIONS = ((None, None), ('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 0), ('lzma', 6))
+
+
+def _encode(study, study_format, encoding):
+    if study_format == 'columnar':
+        return _encode_artifact(_study_to_columnar(study), encoding)
+    content, buffers = _dump_pickle(study, encoding)
+    return _encode_artifact(content, encoding, buffers)
+
+
+def _decode(content, study_format):
+    payload, buffers = _decode_artifact(content)
+    if study_format == 'columnar':
+        return _study_from_columnar(payload)
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _best_of(repeat, function, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3, help='the fastest of this many runs is reported')
+    parser.add_argument('--output', default='study_compression.json')
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    variants = [('columnar', None)] + [('pickle', protocol) for protocol in (None, 5)
+                                       if protocol is None or protocol <= pickle.HIGHEST_PROTOCOL]
+    cases = []
+    for size in args.sizes:
+        study = make_study(size)
+        for (study_format, protocol), (compression, level) in ((v, c) for v in variants for c in COMPRESSIONS):
+            encoding = _artifact_encoding(compression, level, protocol)
+            encode_seconds, content = _best_of(args.repeat, _encode, study, study_format, encoding)
+            decode_seconds, loaded = _best_of(args.repeat, _decode, content, study_format)
+            assert len(loaded.trials) == size
+            case = {
+                'size': size,
+                'format': study_format,
+                'pickle_protocol': protocol,
+                'compression': compression,
+                'level': level,
+                'bytes': len(content),
+                'encode_seconds': encode_seconds,
+                'decode_seconds': decode_seconds,
+            }
+            print(json.dumps(case), file=sys.stderr)
+            cases.append(case)
+
+    with open(args.output, 'w') as f:
+        json.dump({'benchmark': 'study_compression', 'optuna': optuna.__version__, 'cases': cases}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
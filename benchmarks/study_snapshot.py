@@ -0,0 +1,88 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compares the size and the speed of the 'pickle' and 'columnar' study snapshot formats.
+
+For every study size, the study is serialized as `_log_study` does and loaded back as `load_study_from_run` does:
+
+    python benchmarks/study_snapshot.py --sizes 1000 10000 100000 --output study_snapshot.json
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+import warnings
+
+import optuna
+
+from neptune_optuna.impl import _study_from_columnar, _study_to_columnar
+
+from _studies import make_study
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+FORMATS = {
+    'pickle': (pickle.dumps, pickle.loads),
+    'columnar': (_study_to_columnar, _study_from_columnar),
+}
+
+
+def _best_of(repeat, function, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--objectives', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='the fastest of this many runs is reported')
+    parser.add_argument('--output', default='study_snapshot.json')
+    args = parser.parse_args(argv)
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    warnings.simplefilter('ignore', optuna.exceptions.ExperimentalWarning)
+    cases = []
+    for size in args.sizes:
+        study = make_study(size, args.objectives)
+        for name, (dump, load) in FORMATS.items():
+            dump_seconds, content = _best_of(args.repeat, dump, study)
+            load_seconds, loaded = _best_of(args.repeat, load, content)
+            assert len(loaded.trials) == size
+            case = {
+                'size': size,
+                'objectives': args.objectives,
+                'format': name,
+                'bytes': len(content),
+                'dump_seconds': dump_seconds,
+                'load_seconds': load_seconds,
+            }
+            print(json.dumps(case), file=sys.stderr)
+            cases.append(case)
+
+    with open(args.output, 'w') as f:
+        json.dump({'benchmark': 'study_snapshot', 'optuna': optuna.__version__, 'cases': cases}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,6 +14,22 @@
 # limitations under the License.
 #
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+import sys
+
+
+def _get_version():
+    from ._version import get_versions
+    return get_versions()['version']
+
+
+def __getattr__(name):
+    # Resolving the version runs git in a source checkout, so it is only done once someone asks for it.
+    if name == '__version__':
+        globals()['__version__'] = _get_version()
+        return globals()['__version__']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ (PEP 562) is not available
+    __version__ = _get_version()
@@ -0,0 +1,108 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""The `neptune-optuna` command.
+
+    neptune-optuna mirror --storage postgresql://... --study-name my_study --project my_workspace/my_project
+
+follows a study in its storage and logs it to a Neptune Run while other processes optimize it, see `mirror_study`.
+The run is created unless `--run-id` names an existing one. The API token is read from `NEPTUNE_API_TOKEN`.
+"""
+
+import argparse
+import inspect
+import signal
+import sys
+import threading
+
+__all__ = [
+    'main',
+]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='neptune-optuna')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    mirror = commands.add_parser('mirror', help='log a study to Neptune by following its storage')
+    storage = mirror.add_mutually_exclusive_group(required=True)
+    storage.add_argument('--storage', help='database URL of the study storage')
+    storage.add_argument('--journal-file', help='journal file of the study storage (optuna>=3.1)')
+    mirror.add_argument('--study-name', required=True)
+    mirror.add_argument('--project', default=None, help='defaults to NEPTUNE_PROJECT')
+    mirror.add_argument('--run-id', default=None, help='id of an existing run to log to, e.g. PROJ-123')
+    mirror.add_argument('--mode', default='async', help="connection mode of the run, e.g. 'debug' to test")
+    mirror.add_argument('--base-namespace', default='')
+    mirror.add_argument('--poll-interval', type=float, default=10.0, help='seconds between two reads of the storage')
+    mirror.add_argument('--plots-interval', type=float, default=300.0,
+                        help='minimum seconds between two plot refreshes, 0 disables the plots')
+    mirror.add_argument('--plot-payload', default='standalone', choices=('standalone', 'cdn', 'json'))
+    mirror.add_argument('--chunk-size', type=int, default=1000)
+    mirror.add_argument('--max-polls', type=int, default=None, help='stop after this many polls')
+    args = parser.parse_args(argv)
+
+    return _mirror(args)
+
+
+def _mirror(args) -> int:
+    import optuna
+
+    from neptune_optuna.impl import TimeInterval, mirror_study
+
+    study = optuna.load_study(study_name=args.study_name, storage=_load_storage(args))
+    run = _init_run(args.project, args.run_id, args.mode)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # finish the poll in progress so that the run is stopped with everything it was given
+        signal.signal(signum, lambda *_: stop_event.set())
+    try:
+        mirror_study(study, run,
+                     base_namespace=args.base_namespace,
+                     poll_interval=args.poll_interval,
+                     plots_update_freq=TimeInterval(args.plots_interval) if args.plots_interval > 0 else 'never',
+                     plot_payload=args.plot_payload,
+                     chunk_size=args.chunk_size,
+                     max_polls=args.max_polls,
+                     stop_event=stop_event)
+    finally:
+        run.stop()
+    return 0
+
+
+def _load_storage(args):
+    if args.storage is not None:
+        return args.storage
+
+    import optuna
+
+    if not hasattr(optuna.storages, 'JournalStorage'):
+        raise SystemExit(f'--journal-file needs optuna>=3.1, found {optuna.__version__}')
+    return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(args.journal_file))
+
+
+def _init_run(project, run_id, mode):
+    from neptune_optuna.impl import neptune
+
+    init_run = getattr(neptune, 'init_run', None) or neptune.init
+    # neptune-client>=1.0.0 renamed the argument naming an existing run
+    id_argument = 'with_id' if 'with_id' in inspect.signature(init_run).parameters else 'run'
+    return init_run(project=project, mode=mode, **{id_argument: run_id})
+
+
+if __name__ == '__main__':
+    sys.exit(main())
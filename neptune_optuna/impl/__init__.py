@@ -16,30 +16,121 @@
 __all__ = [
     'NeptuneCallback',
     'log_study_metadata',
+    'mirror_study',
     'load_study_from_run',
+    'UpdateSchedule',
+    'EveryNTrials',
+    'TimeInterval',
+    'ExponentialBackoff',
+    'OverheadBudget',
+    'RecordingRun',
 ]
 
-from typing import Iterable, Union
+import bisect
+import collections
+import contextlib
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import pickle
+import random
+import struct
+import tempfile
+import threading
+import time
+import types
+import uuid
+import warnings
+import zlib
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import neptune_optuna
+from neptune_optuna.impl.recording import RecordingRun
+
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    neptune and optuna (with numpy, scipy and sqlalchemy behind them) take most of the time spent importing this
+    integration, and worker processes that never log anything should not pay for them.
+    """
+
+    def __init__(self, load):
+        self._load = load
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = self._load()
+        return getattr(self._module, name)
+
+
+def _import_neptune():
+    try:
+        # neptune-client=0.9.0+ package structure
+        import neptune.new as neptune
+    except ImportError:
+        # neptune-client>=1.0.0 package structure
+        import neptune
+    return neptune
+
+
+def _import_neptune_utils():
+    try:
+        # neptune-client=0.9.0+ package structure
+        from neptune.new.internal import utils
+        from neptune.new.internal.utils import compatibility
+    except ImportError:
+        # neptune-client>=1.0.0 package structure
+        from neptune.internal import utils
+        from neptune.internal.utils import compatibility
+    return types.SimpleNamespace(verify_type=utils.verify_type,
+                                 expect_not_an_experiment=compatibility.expect_not_an_experiment)
+
+
+def _import_optuna():
+    import optuna
+    return optuna
+
+
+neptune = _LazyModule(_import_neptune)
+optuna = _LazyModule(_import_optuna)
+File = _LazyModule(lambda: neptune.types.File)
+_neptune_utils = _LazyModule(_import_neptune_utils)
+
+
+def verify_type(var_name, var, expected_type):
+    _neptune_utils.verify_type(var_name, var, expected_type)
 
-import optuna
 
-from neptune_optuna import __version__
+def expect_not_an_experiment(run):
+    _neptune_utils.expect_not_an_experiment(run)
 
-try:
-    # neptune-client=0.9.0+ package structure
-    import neptune.new as neptune
-    from neptune.new.types import File
-    from neptune.new.internal.utils import verify_type
-    from neptune.new.internal.utils.compatibility import expect_not_an_experiment
-except ImportError:
-    # neptune-client>=1.0.0 package structure
-    import neptune
-    from neptune.types import File
-    from neptune.internal.utils import verify_type
-    from neptune.internal.utils.compatibility import expect_not_an_experiment
 
 INTEGRATION_VERSION_KEY = 'source_code/integrations/neptune-optuna'
 
+TRIALS_CHUNK_SIZE = 1000
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'coalesce')
+PLOT_PAYLOADS = ('standalone', 'cdn', 'json')
+SAMPLED_PLOTS = ('plot_contour', 'plot_parallel_coordinate', 'plot_slice')
+PLOTLY_ASSET_KEY = 'visualizations/plotly.min.js'
+STUDY_SNAPSHOT_MODES = ('full', 'incremental')
+STUDY_FORMATS = ('pickle', 'columnar')
+_COLUMNAR_FORMAT = 'neptune-optuna/columnar'
+_COLUMNAR_VERSION = 1
+_MISSING_TIMESTAMP = -2 ** 63
+ARTIFACT_COMPRESSIONS = ('zlib', 'lzma')
+_ARTIFACT_MAGIC = b'\x93NEPTUNE-OPTUNA'
+_ARTIFACT_VERSION = 1
+_CACHE_PARTIAL_PREFIX = '.partial-'
+_LEASE_KEY_PREFIX = 'neptune_optuna:lease'
+_SYNC_KEY = 'study/sync'
+
 
 class NeptuneCallback:
     """A callback that logs the metadata from Optuna Study to Neptune.
@@ -54,14 +145,37 @@ class NeptuneCallback:
     * and more
 
     Args:
-        run(neptune.Run): Neptune Run.
+        run(neptune.Run): Neptune Run. A `RecordingRun` can be passed instead to log offline.
         base_namespace(str, optional): Namespace inside the Run where your study metadata is logged. Defaults to ''.
-        plots_update_freq(int, str, optional): Frequency at which plots are logged and updated in Neptune.
-            If you pass integer value k, plots will be updated every k iterations.
-            If you pass the string 'never', plots will not be logged. Defaults to 1.
-        study_update_freq(int, str, optional): It is a frequency at which a study object is logged and updated in Neptune.
-            If you pass integer value k, the study will be updated every k iterations.
-            If you pass the string 'never', plots will not be logged. Defaults to 1.
+        plots_update_freq(int, str, UpdateSchedule, optional): Frequency at which plots are logged and updated
+            in Neptune. If you pass integer value k, plots will be updated every k trials finished by this callback.
+            If you pass the string 'never', plots will not be logged.
+            You can also pass an `UpdateSchedule` such as `TimeInterval`, `ExponentialBackoff` or `OverheadBudget`.
+            Defaults to 1.
+        study_update_freq(int, str, UpdateSchedule, optional): It is a frequency at which a study object is logged
+            and updated in Neptune. If you pass integer value k, the study will be updated every k trials finished
+            by this callback. If you pass the string 'never', the study will not be logged.
+            You can also pass an `UpdateSchedule`. Defaults to 1.
+        study_snapshot(str, optional): How an 'InMemoryStorage' study is logged.
+            'full' pickles the whole study on every update.
+            'incremental' pickles the whole study once and then only uploads the trials finished since
+            the previous update, which `load_study_from_run` replays on top of it. Defaults to 'full'.
+        study_compaction_freq(int, optional): With `study_snapshot='incremental'`, the number of incremental
+            updates after which the whole study is pickled again. Defaults to 100.
+        study_format(str, optional): How the whole 'InMemoryStorage' study is serialized.
+            'pickle' pickles the study object, including its sampler and pruner.
+            'columnar' stores the trials as NumPy arrays (one column per param, categoricals as indices into
+            their choices) next to a JSON header with the distributions and attrs. It is smaller and faster
+            to write and load, and does not depend on the Python or optuna version, but the loaded study uses
+            the default sampler and pruner. Defaults to 'pickle'.
+        study_compression(str, optional): Compression of the uploaded study and incremental deltas,
+            'zlib' or 'lzma'. If `None`, they are not compressed. Defaults to `None`.
+        study_compression_level(int, optional): Level of `study_compression`, from 0 to 9.
+            Defaults to `None`, which uses the default level of the compressor.
+        study_pickle_protocol(int, optional): Pickle protocol of the study and the incremental deltas.
+            With protocol 5 (Python 3.8+) large buffers, such as NumPy arrays held by samplers,
+            are stored out of band next to the pickle instead of being copied into it.
+            Defaults to `None`, which uses the default protocol.
         visualization_backend(str, optional): Which visualization backend is used for 'optuna.visualizations' plots.
             It can be one of 'matplotlib' or 'plotly'. Defaults to 'plotly'.
         log_plot_contour(bool, optional): If 'True' the `optuna.visualizations.plot_contour`
@@ -82,6 +196,73 @@ class NeptuneCallback:
             If your `optuna.study` is not using pruners this plot is not logged. Defaults to `True`. Defaults to `True`.
         log_plot_optimization_history(bool, optional): If 'True' the `optuna.visualizations.plot_optimization_history`
             visualization will be logged to Neptune. Defaults to `True`.
+        incremental_plots(bool, optional): If 'True' the optimization history and the intermediate values are not
+            rendered with `optuna.visualization` but appended, for each new trial, to the series
+            'visualizations/optimization_history/value', 'visualizations/optimization_history/best_value' and
+            'visualizations/intermediate_values/<trial number>'. Each update then costs O(new trials) instead of
+            O(all trials). Defaults to `False`.
+        skip_unchanged_plots(bool, optional): If 'True' a plot is only rendered and uploaded again when the trials
+            it depends on have changed, e.g. a pruned trial does not refresh `plot_slice`. Defaults to `True`.
+        plots_time_budget(float, optional): Seconds that rendering plots may take per plot update.
+            The render time of every plot is measured and logged under 'visualizations/render_time', and plots
+            that do not fit into the budget are refreshed less often than cheap ones.
+            If `None`, all plots are refreshed on every update. Defaults to `None`.
+        importance_evaluator(optuna.importance.BaseImportanceEvaluator, optional): Evaluator of the parameter
+            importances drawn in `plot_param_importances`, e.g. the faster
+            `optuna.importance.MeanDecreaseImpurityImportanceEvaluator`. Setting it, `importance_refit_fraction` or
+            `importance_max_trials` caches the importances, logs them under 'visualizations/param_importances'
+            and reuses them for the plot. Defaults to `None`, which uses the optuna default evaluator (fANOVA).
+        importance_refit_fraction(float, optional): Cached importances are computed again only once the number of
+            complete trials has grown by this fraction since the last computation. Defaults to 0.1 when the cache
+            is enabled.
+        importance_max_trials(int, optional): If set, importances are computed on a random subsample of at most
+            this many complete trials. Defaults to `None`.
+        plot_max_trials(int, optional): Maximum number of trials drawn in `plot_contour`, `plot_parallel_coordinate`
+            and `plot_slice`. Larger studies are drawn from a sample that keeps the best and the most recent trials
+            and spreads the rest evenly over the objective value quantiles. If `None`, all trials are drawn.
+            Defaults to `None`.
+        plot_payload(str, optional): How plotly figures are uploaded.
+            'standalone' uploads HTML files that each embed the whole plotly.js library.
+            'cdn' uploads figure-only HTML files that load the matching plotly.js version from the plotly CDN.
+            'json' uploads the figures as gzipped plotly JSON, and the plotly.js library under
+            'visualizations/plotly.min.js' unless the run already has it. Matplotlib figures are always uploaded
+            as HTML.
+            Defaults to 'standalone'.
+        plot_processes(int, optional): Number of worker processes rendering plots. Each plot type is rendered
+            in parallel on a snapshot of the trials, and a render is discarded when a newer one of the same plot
+            was requested. Call `close()` (or `flush()`) to wait for the last plots. The processes are not forked
+            from the optimizing one, so a script using them has to guard its entry point with
+            `if __name__ == '__main__':`.
+            If 0, plots are rendered in the thread running the callback. Defaults to 0.
+        async_mode(bool, optional): If 'True' the callback only enqueues the finished trial and a background thread
+            logs it to Neptune, so logging does not block `study.optimize`. Call `close()` (or `flush()`) once the
+            optimization is done to make sure all queued trials are logged. Defaults to `False`.
+            Without it, the callback is still safe to use with `study.optimize(n_jobs>1)`: a thread that finds
+            another one logging only enqueues its trial, and the logging thread picks it up together with
+            all other queued trials, refreshing best trials, plots and the study once for all of them.
+        max_queue_size(int, optional): Maximum number of pending entries in `async_mode`. Defaults to 1000.
+        backpressure(str, optional): What happens in `async_mode` when the queue is full.
+            'block' waits for the background thread to free a slot,
+            'drop_oldest' discards the oldest pending entry,
+            'coalesce' merges the trial into the newest pending entry so that best trials, plots and the study
+            are refreshed once for all of them. Defaults to 'block'.
+        collect_stats(bool, optional): If 'True' the callback times each of its stages ('log_trial',
+            'log_best_trials', 'incremental_plots', 'log_plots', 'log_study') and the rendering of every plot type,
+            keeping the most recent 1000 timings of each. See `stats()`. Defaults to `False`.
+        stats_update_freq(int, str, UpdateSchedule, optional): With `collect_stats`, how often the summary
+            returned by `stats()` is logged under 'monitoring/neptune_optuna'. If you pass the string 'never',
+            it is not logged. Defaults to 100.
+        coordinate_workers(bool, optional): If 'True' several processes optimizing the same study (e.g. through
+            `RDBStorage`) and logging to the same run (e.g. opened with `with_id`) share the work instead of
+            each of them refreshing everything. Every worker logs only the trials it ran, and the refresh duties,
+            i.e. the best trials, the plots and the study snapshot, are taken by the one worker holding a lease
+            stored in the study system attrs. The lease holder draws them from the trials of all workers.
+            The update schedules count the trials of the lease holder. Call `close()` when a worker is done,
+            so that it hands the lease over and the last worker to finish logs the final state.
+            Defaults to `False`.
+        lease_seconds(float, optional): With `coordinate_workers`, how long the lease lasts without being renewed,
+            after which another worker takes it over. It should be much longer than the clock skew between
+            the hosts of the workers. Defaults to 60.
 
     Examples:
         Create a Run:
@@ -102,10 +283,16 @@ class NeptuneCallback:
     """
 
     def __init__(self,
-                 run: neptune.Run,
+                 run: 'neptune.Run',
                  base_namespace: str = '',
-                 plots_update_freq: Union[int, str] = 1,
-                 study_update_freq: Union[int, str] = 1,
+                 plots_update_freq: Union[int, str, 'UpdateSchedule'] = 1,
+                 study_update_freq: Union[int, str, 'UpdateSchedule'] = 1,
+                 study_snapshot: str = 'full',
+                 study_compaction_freq: int = 100,
+                 study_format: str = 'pickle',
+                 study_compression: Optional[str] = None,
+                 study_compression_level: Optional[int] = None,
+                 study_pickle_protocol: Optional[int] = None,
                  visualization_backend: str = 'plotly',
                  log_plot_contour: bool = True,
                  log_plot_edf: bool = True,
@@ -114,14 +301,36 @@ class NeptuneCallback:
                  log_plot_pareto_front: bool = True,
                  log_plot_slice: bool = True,
                  log_plot_intermediate_values: bool = True,
-                 log_plot_optimization_history: bool = True):
+                 log_plot_optimization_history: bool = True,
+                 incremental_plots: bool = False,
+                 skip_unchanged_plots: bool = True,
+                 plots_time_budget: Optional[float] = None,
+                 importance_evaluator: Optional['optuna.importance.BaseImportanceEvaluator'] = None,
+                 importance_refit_fraction: Optional[float] = None,
+                 importance_max_trials: Optional[int] = None,
+                 plot_max_trials: Optional[int] = None,
+                 plot_payload: str = 'standalone',
+                 plot_processes: int = 0,
+                 async_mode: bool = False,
+                 max_queue_size: int = 1000,
+                 backpressure: str = 'block',
+                 collect_stats: bool = False,
+                 stats_update_freq: Union[int, str, 'UpdateSchedule'] = 100,
+                 coordinate_workers: bool = False,
+                 lease_seconds: float = 60):
 
         expect_not_an_experiment(run)
-        verify_type('run', run, neptune.Run)
+        verify_type('run', run, (neptune.Run, RecordingRun))
         verify_type('base_namespace', base_namespace, str)
 
-        verify_type('log_plots_freq', plots_update_freq, (int, str, type(None)))
-        verify_type('log_study_freq', study_update_freq, (int, str, type(None)))
+        verify_type('log_plots_freq', plots_update_freq, (int, str, UpdateSchedule, type(None)))
+        verify_type('log_study_freq', study_update_freq, (int, str, UpdateSchedule, type(None)))
+        verify_type('study_snapshot', study_snapshot, str)
+        verify_type('study_compaction_freq', study_compaction_freq, int)
+        verify_type('study_format', study_format, str)
+        verify_type('study_compression', study_compression, (str, type(None)))
+        verify_type('study_compression_level', study_compression_level, (int, type(None)))
+        verify_type('study_pickle_protocol', study_pickle_protocol, (int, type(None)))
         verify_type('visualization_backend', visualization_backend, (str, type(None)))
         verify_type('log_plot_contour', log_plot_contour, (bool, type(None)))
         verify_type('log_plot_edf', log_plot_edf, (bool, type(None)))
@@ -131,11 +340,48 @@ class NeptuneCallback:
         verify_type('log_plot_slice', log_plot_slice, (bool, type(None)))
         verify_type('log_plot_intermediate_values', log_plot_intermediate_values, (bool, type(None)))
         verify_type('log_plot_optimization_history', log_plot_optimization_history, (bool, type(None)))
+        verify_type('incremental_plots', incremental_plots, bool)
+        verify_type('skip_unchanged_plots', skip_unchanged_plots, bool)
+        verify_type('plots_time_budget', plots_time_budget, (int, float, type(None)))
+        verify_type('importance_evaluator', importance_evaluator,
+                    (optuna.importance.BaseImportanceEvaluator, type(None)))
+        verify_type('importance_refit_fraction', importance_refit_fraction, (int, float, type(None)))
+        verify_type('importance_max_trials', importance_max_trials, (int, type(None)))
+        verify_type('plot_max_trials', plot_max_trials, (int, type(None)))
+        verify_type('plot_payload', plot_payload, str)
+        verify_type('plot_processes', plot_processes, int)
+        verify_type('async_mode', async_mode, bool)
+        verify_type('max_queue_size', max_queue_size, int)
+        verify_type('backpressure', backpressure, str)
+        verify_type('collect_stats', collect_stats, bool)
+        verify_type('stats_update_freq', stats_update_freq, (int, str, UpdateSchedule, type(None)))
+        verify_type('coordinate_workers', coordinate_workers, bool)
+        verify_type('lease_seconds', lease_seconds, (int, float))
+
+        if study_snapshot not in STUDY_SNAPSHOT_MODES:
+            raise ValueError(f'study_snapshot must be one of {STUDY_SNAPSHOT_MODES}, got {study_snapshot!r}')
+        if study_format not in STUDY_FORMATS:
+            raise ValueError(f'study_format must be one of {STUDY_FORMATS}, got {study_format!r}')
+        self._artifact_encoding = _artifact_encoding(study_compression, study_compression_level,
+                                                     study_pickle_protocol)
+        if plot_payload not in PLOT_PAYLOADS:
+            raise ValueError(f'plot_payload must be one of {PLOT_PAYLOADS}, got {plot_payload!r}')
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f'backpressure must be one of {BACKPRESSURE_POLICIES}, got {backpressure!r}')
+        if lease_seconds <= 0:
+            raise ValueError(f'lease_seconds must be positive, got {lease_seconds}')
 
         self.run = run[base_namespace]
         self._visualization_backend = visualization_backend
-        self._plots_update_freq = plots_update_freq
-        self._study_update_freq = study_update_freq
+        self._plots_schedule = _as_schedule(plots_update_freq)
+        self._study_schedule = _as_schedule(study_update_freq)
+        self._study_snapshot = study_snapshot
+        self._study_compaction_freq = study_compaction_freq
+        self._study_format = study_format
+        self._snapshot_seq = 0
+        self._snapshot_base_seq = None
+        self._snapshot_pending = []
+        self._best_trials_tracker = None
         self._log_plot_contour = log_plot_contour
         self._log_plot_edf = log_plot_edf
         self._log_plot_parallel_coordinate = log_plot_parallel_coordinate
@@ -145,15 +391,160 @@ class NeptuneCallback:
         self._log_plot_intermediate_values = log_plot_intermediate_values
         self._log_plot_optimization_history = log_plot_optimization_history
 
-        run[INTEGRATION_VERSION_KEY] = __version__
-
-    def __call__(self, study: optuna.Study, trial: optuna.trial.FrozenTrial):
-        self._log_trial(trial)
-        self._log_trial_distributions(trial)
-        self._log_best_trials(study)
-        self._log_study_details(study, trial)
-        self._log_plots(study, trial)
-        self._log_study(study, trial)
+        run[INTEGRATION_VERSION_KEY] = neptune_optuna.__version__
+
+        self._incremental_plots = _IncrementalPlots(self.run,
+                                                    log_optimization_history=log_plot_optimization_history,
+                                                    log_intermediate_values=log_plot_intermediate_values,
+                                                    ) if incremental_plots else None
+        self._skip_unchanged_plots = skip_unchanged_plots
+        self._study_fingerprint = _StudyFingerprint()
+        self._plot_fingerprints = {}
+        self._plot_cost_model = _PlotCostModel(plots_time_budget) if plots_time_budget is not None else None
+        self._importances = None
+        if importance_evaluator is not None or importance_refit_fraction is not None \
+                or importance_max_trials is not None:
+            self._importances = _ParamImportancesCache(
+                evaluator=importance_evaluator,
+                refit_fraction=importance_refit_fraction if importance_refit_fraction is not None else 0.1,
+                max_trials=importance_max_trials,
+            )
+        self._trial_sampler = _TrialSampler(plot_max_trials) if plot_max_trials is not None else None
+        self._plot_payload = plot_payload
+        self._plotly_asset_logged = False
+        self._stage_timer = _StageTimer() if collect_stats else _NULL_STAGE_TIMER
+        self._stats_schedule = _as_schedule(stats_update_freq) if collect_stats else None
+        self._plot_pool = _PlotPool(self.run, plot_processes, visualization_backend, plot_payload,
+                                    self._plot_cost_model,
+                                    self._stage_timer if collect_stats else None) if plot_processes > 0 else None
+        self._worker = _AsyncWorker(self._process, max_queue_size, backpressure) if async_mode else None
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._lease = None
+        self._observed = None
+        self._last_study = None
+        if coordinate_workers:
+            self._lease = _StudyLease(f"{_LEASE_KEY_PREFIX}:{run['sys/id'].fetch()}:{base_namespace}", lease_seconds)
+            # numbers of the finished trials the fingerprint and the trial sampler have seen
+            self._observed = set()
+
+    def __call__(self, study: 'optuna.Study', trial: 'optuna.trial.FrozenTrial'):
+        if self._worker is not None:
+            self._worker.submit(study, trial)
+        else:
+            self._process_concurrently(study, trial)
+
+    def _process_concurrently(self, study, trial):
+        # With n_jobs>1 optuna calls back from many threads. The thread that takes the process lock logs the trials
+        # of all of them, so _process never runs twice at once and concurrent refreshes are merged into one.
+        with self._pending_lock:
+            self._pending.append((study, [trial]))
+        while True:
+            if not self._process_lock.acquire(blocking=False):
+                return
+            try:
+                while True:
+                    with self._pending_lock:
+                        pending, self._pending = self._pending, []
+                    if not pending:
+                        break
+                    for batch_study, trials in _merge_batches(pending):
+                        self._process(batch_study, trials)
+            finally:
+                self._process_lock.release()
+            # a trial enqueued after the last check but before the release would be left behind otherwise
+            with self._pending_lock:
+                if not self._pending:
+                    return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until all trials queued in `async_mode` and all plots rendered by `plot_processes` are logged.
+
+        Returns `False` if the timeout expired first. Does nothing if neither option is used.
+        """
+        done = True
+        if self._worker is not None:
+            done = self._worker.flush(timeout)
+        if self._plot_pool is not None:
+            done = self._plot_pool.flush(timeout) and done
+        return done
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Logs all pending trials and plots and stops the background thread and plot processes."""
+        done = True
+        if self._worker is not None:
+            done = self._worker.close(timeout)
+        if self._lease is not None:
+            with self._process_lock:
+                self._hand_over_lease()
+        if self._plot_pool is not None:
+            done = self._plot_pool.close(timeout) and done
+        return done
+
+    def stats(self) -> dict:
+        """Returns how long each stage of the callback took, if it was created with `collect_stats=True`.
+
+        The result maps every stage, and every plot type as 'plots/<plot name>', to the number of timings,
+        their total and the mean, median (p50), p90, p99 and maximum of the most recent ones, in seconds.
+        """
+        return self._stage_timer.summary()
+
+    def _process(self, study: 'optuna.Study', trials: List['optuna.trial.FrozenTrial']):
+        timer = self._stage_timer
+        with timer.time('log_trial'):
+            for trial in trials:
+                self._log_trial(trial)
+                self._log_trial_distributions(trial)
+                self._log_study_details(study, trial)
+                self._observe(study, trial)
+        if self._incremental_plots is not None:
+            with timer.time('incremental_plots'):
+                self._incremental_plots.log(study, trials)
+        if self._lease is not None:
+            self._last_study = study
+        if self._lease is None or self._lease.acquire(study):
+            self._refresh(study, trials)
+        if self._stats_schedule is not None:
+            self._log_stats(trials)
+
+    def _refresh(self, study, trials, force=False):
+        timer = self._stage_timer
+        with timer.time('log_best_trials'):
+            self._log_best_trials(study, trials)
+        with timer.time('log_plots'):
+            self._log_plots(study, trials, force)
+        with timer.time('log_study'):
+            self._log_study(study, trials, force)
+
+    def _hand_over_lease(self):
+        # a worker that is done refreshes once more if the lease is free, so the last one to finish logs the trials
+        # that the others finished after the lease holder's last refresh
+        if self._last_study is None or not self._lease.acquire(self._last_study):
+            return
+        self._refresh(self._last_study, [], force=True)
+        self._lease.release(self._last_study)
+
+    def _observe(self, study, trial):
+        self._study_fingerprint.observe(trial)
+        if self._trial_sampler is not None:
+            self._trial_sampler.observe(study, trial)
+        if self._observed is not None:
+            self._observed.add(trial.number)
+
+    def _observe_other_workers(self, study):
+        states = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED, optuna.trial.TrialState.FAIL)
+        for trial in study.get_trials(deepcopy=False, states=states):
+            if trial.number not in self._observed:
+                self._observe(study, trial)
+
+    def _log_stats(self, trials):
+        for trial in trials:
+            self._stats_schedule.observe(trial)
+        if self._stats_schedule.is_due():
+            start = time.monotonic()
+            self.run['monitoring/neptune_optuna'] = self._stage_timer.summary()
+            self._stats_schedule.updated(time.monotonic() - start)
 
     def _log_trial(self, trial):
         _log_trials(self.run, [trial])
@@ -161,52 +552,425 @@ class NeptuneCallback:
     def _log_trial_distributions(self, trial):
         self.run['study/distributions'].log(trial.distributions)
 
-    def _log_best_trials(self, study):
-        self.run['best'] = _stringify_keys(_log_best_trials(study))
+    def _log_best_trials(self, study, trials):
+        if self._best_trials_tracker is None:
+            # trials finished before the callback was attached are only visible through the study
+            self._best_trials_tracker = _BestTrialsTracker(study.directions, _study_best_trials(study))
+            changed = True
+        elif self._lease is not None:
+            # the other workers' trials are only visible through the study too
+            best_trials = _study_best_trials(study)
+            changed = [trial.number for trial in best_trials] \
+                != [trial.number for trial in self._best_trials_tracker.best_trials]
+            if changed:
+                self._best_trials_tracker = _BestTrialsTracker(study.directions, best_trials)
+        else:
+            changed = False
+            for trial in trials:
+                changed = self._best_trials_tracker.update(trial) or changed
+
+        if changed:
+            self.run['best'] = _stringify_keys(_best_trials_to_dict(self._best_trials_tracker.best_trials))
 
     def _log_study_details(self, study, trial):
         if trial._trial_id == 0:
             _log_study_details(self.run, study)
 
-    def _log_plots(self, study, trial):
-        if self._should_log_plots(study, trial):
-            _log_plots(self.run, study,
-                       visualization_backend=self._visualization_backend,
-                       log_plot_contour=self._log_plot_contour,
-                       log_plot_edf=self._log_plot_edf,
-                       log_plot_parallel_coordinate=self._log_plot_parallel_coordinate,
-                       log_plot_param_importances=self._log_plot_param_importances,
-                       log_plot_pareto_front=self._log_plot_pareto_front,
-                       log_plot_slice=self._log_plot_slice,
-                       log_plot_optimization_history=self._log_plot_optimization_history,
-                       log_plot_intermediate_values=self._log_plot_intermediate_values,
-                       )
-
-    def _log_study(self, study, trial):
-        if self._should_log_study(trial):
-            _log_study(self.run, study)
-
-    def _should_log_plots(self, study: optuna.study.Study, trial: optuna.trial.FrozenTrial):
-        if not len(study.get_trials(states=(optuna.trial.TrialState.COMPLETE,))):
+    def _log_plots(self, study, trials, force=False):
+        if not self._should_log_plots(trials, force):
+            return
+
+        start = time.monotonic()
+        if self._observed is not None:
+            self._observe_other_workers(study)
+        if self._plot_payload == 'json' and not self._plotly_asset_logged:
+            if not _exists(self.run, PLOTLY_ASSET_KEY):
+                _log_plotly_asset(self.run)
+            self._plotly_asset_logged = True
+
+        plot_names = self._plots_to_refresh(study)
+        sampled_trials = None
+        if self._trial_sampler is not None and any(plot_name in SAMPLED_PLOTS for plot_name in plot_names):
+            sampled_trials = self._trial_sampler.sample(study)
+
+        plot_kwargs = {}
+        if self._importances is not None and 'plot_param_importances' in plot_names:
+            importances = self._importances.get(study)
+            if importances is None:
+                plot_names.remove('plot_param_importances')
+            else:
+                self.run['visualizations/param_importances'] = _stringify_keys(dict(importances))
+                plot_kwargs['plot_param_importances'] = {'evaluator': _precomputed_importances(importances)}
+        if not plot_names:
+            return  # nothing changed since the last refresh, which leaves the schedule due
+
+        if self._plot_pool is not None:
+            self._plot_pool.submit(study, plot_names, sampled_trials, plot_kwargs)
+        else:
+            sampled_study = None
+            if sampled_trials is not None:
+                sampled_study = _in_memory_study(study.study_name, study.directions, sampled_trials)
+            _render_and_log_plots(self.run, study, plot_names, self._visualization_backend,
+                                  plot_payload=self._plot_payload, cost_model=self._plot_cost_model,
+                                  sampled_study=sampled_study, plot_kwargs=plot_kwargs,
+                                  stage_timer=self._stage_timer)
+        self._plots_schedule.updated(time.monotonic() - start)
+
+    def _plots_to_refresh(self, study):
+        plot_names = _plots_to_log(study, **self._plot_options())
+        if self._skip_unchanged_plots:
+            plot_names = [plot_name for plot_name in plot_names
+                          if self._plot_fingerprints.get(plot_name) != self._study_fingerprint.of(plot_name)]
+        if self._plot_cost_model is not None:
+            plot_names = self._plot_cost_model.select(plot_names)
+        for plot_name in plot_names:
+            self._plot_fingerprints[plot_name] = self._study_fingerprint.of(plot_name)
+        return plot_names
+
+    def _plot_options(self):
+        # with incremental_plots, the optimization history and intermediate values are drawn from series instead
+        series_plots = self._incremental_plots is not None
+        return dict(visualization_backend=self._visualization_backend,
+                    log_plot_contour=self._log_plot_contour,
+                    log_plot_edf=self._log_plot_edf,
+                    log_plot_parallel_coordinate=self._log_plot_parallel_coordinate,
+                    log_plot_param_importances=self._log_plot_param_importances,
+                    log_plot_pareto_front=self._log_plot_pareto_front,
+                    log_plot_slice=self._log_plot_slice,
+                    log_plot_optimization_history=self._log_plot_optimization_history and not series_plots,
+                    log_plot_intermediate_values=self._log_plot_intermediate_values and not series_plots)
+
+    def _log_study(self, study, trials, force=False):
+        incremental = self._study_snapshot == 'incremental' and _is_in_memory(study)
+        if incremental:
+            self._snapshot_pending.extend(trials)
+
+        if not self._should_log_study(trials, force):
+            return
+
+        start = time.monotonic()
+        self._log_study_snapshot(study, incremental)
+        self._study_schedule.updated(time.monotonic() - start)
+
+    def _log_study_snapshot(self, study, incremental):
+        if not incremental:
+            _log_study(self.run, study, self._study_format, self._artifact_encoding)
+        elif self._snapshot_base_seq is None \
+                or self._snapshot_seq - self._snapshot_base_seq >= self._study_compaction_freq:
+            # fold the deltas uploaded so far into a new base snapshot
+            _log_study(self.run, study, self._study_format, self._artifact_encoding)
+            self._snapshot_base_seq = self._snapshot_seq
+            self._snapshot_pending = []
+            self.run['study/snapshot/format'] = 'incremental'
+            self.run['study/snapshot/base_seq'] = self._snapshot_base_seq
+            self.run['study/snapshot/last_seq'] = self._snapshot_seq
+        elif self._snapshot_pending:
+            _log_study_delta(self.run, study, self._snapshot_pending, self._snapshot_seq, self._artifact_encoding)
+            self._snapshot_seq += 1
+            self._snapshot_pending = []
+            self.run['study/snapshot/last_seq'] = self._snapshot_seq
+
+    def _should_log_plots(self, trials: List['optuna.trial.FrozenTrial'], force=False):
+        if self._plots_schedule is None:
             return False
-        elif self._plots_update_freq == 'never':
+        for trial in trials:
+            self._plots_schedule.observe(trial)
+        # the best trials are tracked before plots are logged, so an empty front means no trial has completed yet
+        if not self._best_trials_tracker.best_trials:
             return False
-        else:
-            if trial._trial_id % self._plots_update_freq == 0:
-                return True
-        return False
+        return force or self._plots_schedule.is_due()
 
-    def _should_log_study(self, trial: optuna.trial.FrozenTrial):
-        if self._study_update_freq == 'never':
+    def _should_log_study(self, trials: List['optuna.trial.FrozenTrial'], force=False):
+        if self._study_schedule is None:
             return False
-        else:
-            if trial._trial_id % self._study_update_freq == 0:
-                return True
+        for trial in trials:
+            self._study_schedule.observe(trial)
+        return force or self._study_schedule.is_due()
+
+
+class UpdateSchedule:
+    """Decides when NeptuneCallback refreshes the plots or the study snapshot.
+
+    The callback calls `observe` with every finished trial, then asks `is_due` and, after each refresh,
+    reports the seconds it took to `updated`. Subclass it to plug in your own policy.
+    """
+
+    def observe(self, trial: 'optuna.trial.FrozenTrial') -> None:
+        pass
+
+    def is_due(self) -> bool:
+        raise NotImplementedError
+
+    def updated(self, duration: float) -> None:
+        pass
+
+
+class EveryNTrials(UpdateSchedule):
+    """Refreshes on the first trial and then every `n` trials seen by the callback.
+
+    Trials are counted by the callback rather than by their id, so every worker of a distributed study
+    refreshes at the same pace.
+    """
+
+    def __init__(self, n: int):
+        verify_type('n', n, int)
+        if n < 1:
+            raise ValueError(f'n must be positive, got {n}')
+        self._n = n
+        self._seen = 0
+        self._seen_at_update = None
+
+    def observe(self, trial):
+        self._seen += 1
+
+    def is_due(self):
+        # counted from the last refresh rather than by multiples of n, trials may be observed in batches
+        return self._seen_at_update is None or self._seen - self._seen_at_update >= self._n
+
+    def updated(self, duration):
+        self._seen_at_update = self._seen
+
+
+class TimeInterval(UpdateSchedule):
+    """Refreshes at most once every `seconds` of wall-clock time."""
+
+    def __init__(self, seconds: float):
+        verify_type('seconds', seconds, (int, float))
+        self._seconds = seconds
+        self._last_update = None
+
+    def is_due(self):
+        return self._last_update is None or time.monotonic() - self._last_update >= self._seconds
+
+    def updated(self, duration):
+        self._last_update = time.monotonic()
+
+
+class ExponentialBackoff(UpdateSchedule):
+    """Refreshes often at the start of the sweep and exponentially less often later.
+
+    The first refresh happens on the first trial, and the number of trials between refreshes starts at `initial`
+    and is multiplied by `factor` after every refresh, up to `max_interval` trials.
+    """
+
+    def __init__(self, initial: int = 1, factor: float = 2.0, max_interval: Optional[int] = None):
+        verify_type('initial', initial, int)
+        verify_type('factor', factor, (int, float))
+        verify_type('max_interval', max_interval, (int, type(None)))
+        if initial < 1 or factor < 1:
+            raise ValueError('initial must be positive and factor at least 1')
+        self._interval = initial
+        self._factor = factor
+        self._max_interval = max_interval
+        self._seen = 0
+        self._next_update = 1
+
+    def observe(self, trial):
+        self._seen += 1
+
+    def is_due(self):
+        return self._seen >= self._next_update
+
+    def updated(self, duration):
+        self._next_update = self._seen + int(self._interval)
+        self._interval *= self._factor
+        if self._max_interval is not None:
+            self._interval = min(self._interval, self._max_interval)
+
+
+class OverheadBudget(UpdateSchedule):
+    """Refreshes whenever the time spent on refreshes stays under `max_fraction` of the time spent in objectives.
+
+    Objective time is taken from `trial.duration`, so expensive refreshes become rarer as they get slower.
+    """
+
+    def __init__(self, max_fraction: float = 0.05):
+        verify_type('max_fraction', max_fraction, (int, float))
+        if max_fraction <= 0:
+            raise ValueError(f'max_fraction must be positive, got {max_fraction}')
+        self._max_fraction = max_fraction
+        self._objective_time = 0.0
+        self._update_time = 0.0
+
+    def observe(self, trial):
+        if trial.duration is not None:
+            self._objective_time += trial.duration.total_seconds()
+
+    def is_due(self):
+        return self._update_time <= self._max_fraction * self._objective_time
+
+    def updated(self, duration):
+        self._update_time += duration
+
+
+def _as_schedule(update_freq) -> Optional[UpdateSchedule]:
+    if isinstance(update_freq, UpdateSchedule):
+        return update_freq
+    if update_freq == 'never' or update_freq is None:
+        return None
+    return EveryNTrials(update_freq)
+
+
+class _StageTimer:
+    """Rolling window of the most recent durations of every callback stage."""
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._durations = {}
+        self._counts = collections.Counter()
+        self._totals = collections.Counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self._durations:
+                self._durations[stage] = collections.deque(maxlen=self._window)
+            self._durations[stage].append(seconds)
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            durations = {stage: sorted(window) for stage, window in self._durations.items()}
+            counts, totals = dict(self._counts), dict(self._totals)
+        return {stage: {
+            'count': counts[stage],
+            'total': totals[stage],
+            'mean': sum(window) / len(window),
+            'p50': _percentile(window, 0.5),
+            'p90': _percentile(window, 0.9),
+            'p99': _percentile(window, 0.99),
+            'max': window[-1],
+        } for stage, window in durations.items()}
+
+
+class _NullStageTimer:
+    """Stands in for `_StageTimer` when stats are not collected, so timing a stage costs next to nothing."""
+
+    def __init__(self):
+        self._context = _NullContext()
+
+    def time(self, stage: str):
+        return self._context
+
+    def add(self, stage: str, seconds: float):
+        pass
+
+    def summary(self) -> dict:
+        return {}
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
         return False
 
 
-def log_study_metadata(study: optuna.Study,
-                       run: neptune.Run,
+_NULL_STAGE_TIMER = _NullStageTimer()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _AsyncWorker:
+    """Bounded queue of finished trials drained into the Run by a daemon thread."""
+
+    def __init__(self, handler, max_queue_size: int, backpressure: str):
+        if max_queue_size < 1:
+            raise ValueError(f'max_queue_size must be positive, got {max_queue_size}')
+
+        self._handler = handler
+        self._max_queue_size = max_queue_size
+        self._backpressure = backpressure
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._loop, name='neptune-optuna-callback', daemon=True)
+        self._thread.start()
+
+    def submit(self, study, trial):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('NeptuneCallback is closed')
+
+            if len(self._queue) >= self._max_queue_size:
+                if self._backpressure == 'block':
+                    self._cond.wait_for(lambda: len(self._queue) < self._max_queue_size or self._closed)
+                    if self._closed:
+                        # the loop may have exited already, nothing would log the trial
+                        raise RuntimeError('NeptuneCallback is closed')
+                elif self._backpressure == 'drop_oldest':
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self._backpressure == 'coalesce' and self._queue[-1][0] is study:
+                    self._queue[-1][1].append(trial)
+                    return
+
+            self._queue.append((study, [trial]))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                # everything queued so far is logged with a single refresh of best trials, plots and the study
+                batches = _merge_batches(self._queue)
+                self._queue.clear()
+                self._busy = True
+                self._cond.notify_all()
+
+            try:
+                for study, trials in batches:
+                    try:
+                        self._handler(study, trials)
+                    except Exception as e:  # the thread must outlive a single failed upload
+                        warnings.warn(f'NeptuneCallback failed to log trials {[t.number for t in trials]}: {e!r}')
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def _merge_batches(entries: Iterable[Tuple['optuna.Study', list]]) -> List[Tuple['optuna.Study', list]]:
+    """Joins consecutive (study, trials) entries of the same study."""
+    merged = []
+    for study, trials in entries:
+        if merged and merged[-1][0] is study:
+            merged[-1][1].extend(trials)
+        else:
+            merged.append((study, list(trials)))
+    return merged
+
+
+def log_study_metadata(study: 'optuna.Study',
+                       run: 'neptune.Run',
                        base_namespace='',
                        log_plots=True,
                        log_study=True,
@@ -220,7 +984,15 @@ def log_study_metadata(study: optuna.Study,
                        log_plot_pareto_front=True,
                        log_plot_slice=True,
                        log_plot_intermediate_values=True,
-                       log_plot_optimization_history=True):
+                       log_plot_optimization_history=True,
+                       plot_payload='standalone',
+                       study_format='pickle',
+                       study_compression=None,
+                       study_compression_level=None,
+                       study_pickle_protocol=None,
+                       chunk_size=TRIALS_CHUNK_SIZE,
+                       show_progress_bar=False,
+                       sync=False):
     """A function that logs the metadata from Optuna Study to Neptune.
 
     With this function, you can log and display:
@@ -263,6 +1035,28 @@ def log_study_metadata(study: optuna.Study,
             If your `optuna.study` is not using pruners this plot is not logged. Defaults to `True`. Defaults to `True`.
         log_plot_optimization_history(bool, optional): If 'True' the `optuna.visualizations.plot_optimization_history`
             visualization will be logged to Neptune. Defaults to `True`.
+        plot_payload(str, optional): How plotly figures are uploaded. 'standalone' embeds plotly.js in every HTML
+            file, 'cdn' loads it from the plotly CDN and 'json' uploads gzipped figure JSON, and plotly.js unless
+            the run already has it. Defaults to 'standalone'.
+        study_format(str, optional): How an 'InMemoryStorage' study is serialized, 'pickle' or 'columnar'.
+            See `NeptuneCallback`. Defaults to 'pickle'.
+        study_compression(str, optional): Compression of the uploaded study, 'zlib' or 'lzma'.
+            Defaults to `None`.
+        study_compression_level(int, optional): Level of `study_compression`, from 0 to 9. Defaults to `None`.
+        study_pickle_protocol(int, optional): Pickle protocol of the study. See `NeptuneCallback`.
+            Defaults to `None`.
+        chunk_size(int, optional): Number of trials fetched from the study storage and logged at once.
+            The trials are logged one chunk at a time, but the plots are drawn from the whole study, which optuna
+            loads into memory (several times, once per plot). To back-fill a large study with only one chunk of
+            trials in memory at a time, pass `log_plots=False`. Defaults to 1000.
+        show_progress_bar(bool, optional): If 'True' a progress bar shows how many trials were logged.
+            Defaults to 'False'.
+        sync(bool, optional): If 'True' only the changes since the previous call with `sync=True` on the same run
+            are logged, so that it can be called repeatedly on a growing study. The highest trial id read so far
+            and the trials that were still running are recorded under 'study/sync' after every chunk. Subsequent
+            calls only read the trials above that id and the ones that were running, and log those that have
+            finished since; running trials are logged once they finish. Best trials, plots and the study are only
+            logged again if a trial has finished. Defaults to 'False'.
 
     Examples:
         Create a Run:
@@ -281,16 +1075,30 @@ def log_study_metadata(study: optuna.Study,
     .. _Neptune Optuna integration docs page:
        https://docs.neptune.ai/integrations-and-supported-tools/hyperparameter-optimization/optuna
     """
+    trial_sync = _TrialSync(run, base_namespace, study, sync)
     run = run[base_namespace]
+    if trial_sync.synced_before and trial_sync.pending() == 0:
+        return  # nothing has changed since the previous sync
 
-    _log_study_details(run, study)
-    run['best'] = _stringify_keys(_log_best_trials(study))
+    progress_bar = None
+    if show_progress_bar:
+        from tqdm.auto import tqdm
+        progress_bar = tqdm(total=trial_sync.pending(), unit='trial')
+
+    n_logged = 0
+    for trials, n_read in trial_sync.log(chunk_size, log_all_trials, log_distributions):
+        n_logged += len(trials)
+        if progress_bar is not None:
+            progress_bar.update(n_read)
 
-    if log_all_trials:
-        _log_trials(run, study.trials)
+    if progress_bar is not None:
+        progress_bar.close()
 
-    if log_distributions:
-        run['study/distributions'].log(list(trial.distributions for trial in study.trials))
+    if trial_sync.synced_before and n_logged == 0:
+        return  # only trials that are still running were read
+
+    _log_study_details(run, study)
+    run['best'] = _stringify_keys(_best_trials_to_dict(trial_sync.best_trials_tracker.best_trials))
 
     if log_plots:
         _log_plots(run, study,
@@ -303,13 +1111,138 @@ def log_study_metadata(study: optuna.Study,
                    log_plot_slice=log_plot_slice,
                    log_plot_optimization_history=log_plot_optimization_history,
                    log_plot_intermediate_values=log_plot_intermediate_values,
+                   plot_payload=plot_payload,
                    )
 
     if log_study:
-        _log_study(run, study)
+        _log_study(run, study, study_format,
+                   _artifact_encoding(study_compression, study_compression_level, study_pickle_protocol))
+
+
+def mirror_study(study: 'optuna.Study',
+                 run: 'neptune.Run',
+                 base_namespace: str = '',
+                 poll_interval: float = 10.0,
+                 plots_update_freq: Union[int, str, 'UpdateSchedule', None] = None,
+                 log_distributions: bool = True,
+                 visualization_backend: str = 'plotly',
+                 log_plot_contour: bool = True,
+                 log_plot_edf: bool = True,
+                 log_plot_parallel_coordinate: bool = True,
+                 log_plot_param_importances: bool = True,
+                 log_plot_pareto_front: bool = True,
+                 log_plot_slice: bool = True,
+                 log_plot_intermediate_values: bool = True,
+                 log_plot_optimization_history: bool = True,
+                 plot_payload: str = 'standalone',
+                 chunk_size: int = TRIALS_CHUNK_SIZE,
+                 max_polls: Optional[int] = None,
+                 stop_event: Optional[threading.Event] = None):
+    """Follows a study in its storage and logs its trials to Neptune as they finish, instead of a callback.
+
+    The workers optimizing the study then do not log anything, and a single process does all Neptune I/O.
+    Every `poll_interval` seconds the storage is read for the trials created since the previous poll and for those
+    that were still running, and the ones that have finished are logged in chunks, followed by the best trials.
+    What has been mirrored is kept under 'study/sync', as with `log_study_metadata(sync=True)`,
+    so a restarted mirror carries on where the previous one stopped.
+
+    This is what the `neptune-optuna mirror` command runs.
+
+    Args:
+        study(optuna.Study): Optuna study, typically loaded from an `RDBStorage`.
+        run(neptune.Run): Neptune Run.
+        base_namespace(str, optional): Namespace inside the Run where your study metadata is logged. Defaults to ''.
+        poll_interval(float, optional): Seconds between two reads of the storage. Defaults to 10.
+        plots_update_freq(int, str, UpdateSchedule, optional): Frequency at which plots are logged, counted
+            in mirrored trials if you pass an integer. Plots are only refreshed after a poll that mirrored
+            a trial, and once more when the mirror stops. If you pass the string 'never', plots are not logged.
+            Defaults to `None`, which refreshes them at most every 5 minutes.
+        log_distributions(bool, optional): If 'True' the distributions of every trial are logged.
+            Defaults to 'True'.
+        visualization_backend(str, optional): Which visualization backend is used for 'optuna.visualizations' plots.
+            It can be one of 'matplotlib' or 'plotly'. Defaults to 'plotly'.
+        log_plot_contour(bool, optional), log_plot_edf(bool, optional),
+        log_plot_parallel_coordinate(bool, optional), log_plot_param_importances(bool, optional),
+        log_plot_pareto_front(bool, optional), log_plot_slice(bool, optional),
+        log_plot_intermediate_values(bool, optional), log_plot_optimization_history(bool, optional):
+            Which plots are logged, see `log_study_metadata`. Default to `True`.
+        plot_payload(str, optional): How plotly figures are uploaded, see `NeptuneCallback`.
+            Defaults to 'standalone'.
+        chunk_size(int, optional): Number of trials read from the storage and logged at once. Defaults to 1000.
+        max_polls(int, optional): Stops after this many polls. Defaults to `None`, which polls until `stop_event`
+            is set.
+        stop_event(threading.Event, optional): Stops the mirror, after the poll in progress, once it is set.
+            Defaults to `None`.
+
+    Examples:
+        Create a Run:
+        >>> import neptune.new as neptune
+        ... run = neptune.init('my_workspace/my_project')
 
+        Load the Study that workers optimize with an RDB storage:
+        >>> study = optuna.load_study(study_name='my_study', storage='postgresql://...')
 
-def load_study_from_run(run: neptune.Run):
+        Mirror it to Neptune until the workers are done:
+        >>> import neptune.new.integrations.optuna as optuna_utils
+        ... optuna_utils.mirror_study(study, run)
+    """
+    verify_type('base_namespace', base_namespace, str)
+    verify_type('poll_interval', poll_interval, (int, float))
+    verify_type('plots_update_freq', plots_update_freq, (int, str, UpdateSchedule, type(None)))
+    verify_type('chunk_size', chunk_size, int)
+    verify_type('max_polls', max_polls, (int, type(None)))
+    if plot_payload not in PLOT_PAYLOADS:
+        raise ValueError(f'plot_payload must be one of {PLOT_PAYLOADS}, got {plot_payload!r}')
+
+    plots_schedule = _as_schedule(TimeInterval(300) if plots_update_freq is None else plots_update_freq)
+    plot_options = dict(visualization_backend=visualization_backend,
+                        log_plot_contour=log_plot_contour,
+                        log_plot_edf=log_plot_edf,
+                        log_plot_parallel_coordinate=log_plot_parallel_coordinate,
+                        log_plot_param_importances=log_plot_param_importances,
+                        log_plot_pareto_front=log_plot_pareto_front,
+                        log_plot_slice=log_plot_slice,
+                        log_plot_intermediate_values=log_plot_intermediate_values,
+                        log_plot_optimization_history=log_plot_optimization_history,
+                        plot_payload=plot_payload)
+    stop_event = stop_event or threading.Event()
+
+    trial_sync = _TrialSync(run, base_namespace, study, sync=True)
+    run = run[base_namespace]
+    run[INTEGRATION_VERSION_KEY] = neptune_optuna.__version__
+    _log_study(run, study)
+
+    polls = 0
+    plots_stale = False
+    while True:
+        best_trial_ids = trial_sync.state.best_trial_ids
+        n_logged = 0
+        for trials, _ in trial_sync.log(chunk_size, log_distributions=log_distributions):
+            n_logged += len(trials)
+            if plots_schedule is not None:
+                for trial in trials:
+                    plots_schedule.observe(trial)
+
+        if n_logged:
+            _log_study_details(run, study)
+            if trial_sync.state.best_trial_ids != best_trial_ids:
+                run['best'] = _stringify_keys(_best_trials_to_dict(trial_sync.best_trials_tracker.best_trials))
+            plots_stale = plots_schedule is not None and bool(trial_sync.best_trials_tracker.best_trials)
+        if plots_stale and plots_schedule.is_due():
+            start = time.monotonic()
+            _log_plots(run, study, **plot_options)
+            plots_schedule.updated(time.monotonic() - start)
+            plots_stale = False
+
+        polls += 1
+        if (max_polls is not None and polls >= max_polls) or stop_event.wait(poll_interval):
+            break
+
+    if plots_stale:
+        _log_plots(run, study, **plot_options)
+
+
+def load_study_from_run(run: 'neptune.Run', cache_dir: Optional[str] = None, cache_max_bytes: int = 4 * 2 ** 30):
     """A function that loads Optuna Study from an existing Neptune Run.
 
     Loading mechanics depends on the study storage type used during the Neptune Run:
@@ -318,6 +1251,11 @@ def load_study_from_run(run: neptune.Run):
 
     Args:
         run(neptune.Run): Neptune Run.
+        cache_dir(str, optional): Directory where downloaded study pickles are cached, keyed by the run id and
+            the SHA-256 of the pickle, so loading the same study again does not download it again.
+            Only studies logged with a recorded hash (neptune-optuna 0.10.0+) are cached. Defaults to `None`.
+        cache_max_bytes(int, optional): Size of the cache above which the least recently used pickles are
+            removed. Defaults to 4 GiB.
 
     Returns:
         optuna.Study
@@ -336,15 +1274,28 @@ def load_study_from_run(run: neptune.Run):
     .. _Neptune Optuna integration docs page:
        https://docs.neptune.ai/integrations-and-supported-tools/hyperparameter-optimization/optuna
     """
+    cache = _ArtifactCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
     if run['study/storage_type'].fetch() == 'InMemoryStorage':
-        return _get_pickle(path='study/study', run=run)
+        if run.exists('study/study_format') and run['study/study_format'].fetch() == 'columnar':
+            study = _study_from_columnar(_get_artifact(path='study/study', run=run, cache=cache)[0])
+        else:
+            study = _get_pickle(path='study/study', run=run, cache=cache)
+        if run.exists('study/snapshot/format') and run['study/snapshot/format'].fetch() == 'incremental':
+            base_seq = run['study/snapshot/base_seq'].fetch()
+            last_seq = run['study/snapshot/last_seq'].fetch()
+            if last_seq > base_seq:
+                deltas = (_get_pickle(path=f'study/snapshot/deltas/{seq}', run=run, cache=cache)
+                          for seq in range(base_seq, last_seq))
+                study = _replay_study_deltas(study, deltas)
+        return study
     else:
         return optuna.load_study(study_name=run['study/study_name'].fetch(), storage=run['study/storage_url'].fetch())
 
 
-def _log_study_details(run, study: optuna.Study):
+def _log_study_details(run, study: 'optuna.Study'):
     run['study/study_name'] = study.study_name
-    run['study/direction'] = study.direction
+    if not study._is_multi_objective():
+        run['study/direction'] = study.direction
     run['study/directions'] = study.directions
     run['study/system_attrs'] = study.system_attrs
     run['study/user_attrs'] = study.user_attrs
@@ -355,14 +1306,215 @@ def _log_study_details(run, study: optuna.Study):
         pass
 
 
-def _log_study(run, study: optuna.Study):
+def _is_in_memory(study: 'optuna.Study'):
+    return type(getattr(study, '_storage', None)) is optuna.storages._in_memory.InMemoryStorage
+
+
+def _rdb_storage(study: 'optuna.Study'):
+    storage = getattr(study, '_storage', None)
+    if isinstance(storage, optuna.storages._CachedStorage):
+        storage = storage._backend
+    return storage if isinstance(storage, optuna.storages.RDBStorage) else None
+
+
+def _count_trials(study: 'optuna.Study', after_trial_id: int = -1) -> int:
+    storage = _rdb_storage(study)
+    if storage is None:
+        return sum(trial._trial_id > after_trial_id for trial in study.get_trials(deepcopy=False))
+
+    from optuna.storages._rdb import models
+    from optuna.storages._rdb.storage import _create_scoped_session
+
+    with _create_scoped_session(storage.scoped_session) as session:
+        return session.query(models.TrialModel).filter(models.TrialModel.study_id == study._study_id,
+                                                       models.TrialModel.trial_id > after_trial_id).count()
+
+
+def _iter_trials(study: 'optuna.Study', chunk_size: int,
+                 after_trial_id: int = -1) -> Iterator[List['optuna.trial.FrozenTrial']]:
+    """Yields the trials of the study with ids above `after_trial_id` in chunks, without deep copies.
+
+    For RDB storages the trials are paged out of the database by trial id, so only one chunk is held in memory.
+    """
+    storage = _rdb_storage(study)
+    if storage is None:
+        trials = [trial for trial in study.get_trials(deepcopy=False) if trial._trial_id > after_trial_id]
+        for i in range(0, len(trials), chunk_size):
+            yield trials[i:i + chunk_size]
+        return
+
+    from optuna.storages._rdb.storage import _create_scoped_session
+
+    reader = _RDBTrialReader()
+    last_trial_id = after_trial_id
+    while True:
+        with _create_scoped_session(storage.scoped_session) as session:
+            trials = reader.read(session, study._study_id, last_trial_id, chunk_size)
+
+        if not trials:
+            return
+        yield trials
+        last_trial_id = trials[-1]._trial_id
+
+
+class _RDBTrialReader:
+    """Reads pages of trials straight out of the tables of an `RDBStorage`.
+
+    A page is read with one query for the trials and one per table of params, values, intermediate values and
+    attributes, each over the id range of the page joined with the trials of the study, and the rows are assembled
+    into `FrozenTrial`s directly.
+    This skips the ORM objects, the relationship loading and the deep copies of `study.trials`, and parses
+    every distinct distribution only once. The rows are fetched from the DBAPI cursor, so the few columns that
+    sqlalchemy would convert (the datetimes, which SQLite stores as strings, and the enums) are converted here.
+    """
+
+    def __init__(self):
+        import sqlalchemy
+        from optuna.storages._rdb import models
+        self._models = models
+        self._distributions = {}
+        # sqlalchemy<1.4 takes the selected columns as a list, sqlalchemy>=2.0 only as arguments
+        if tuple(int(part) for part in sqlalchemy.__version__.split('.')[:2]) >= (1, 4):
+            self._select = lambda columns: sqlalchemy.select(*columns)
+        else:
+            self._select = lambda columns: sqlalchemy.select(list(columns))
+
+    def read(self, session, study_id: int, after_trial_id: int, limit: int) -> List['optuna.trial.FrozenTrial']:
+        """Returns up to `limit` trials of the study with ids above `after_trial_id`, ordered by id."""
+        models = self._models
+        connection = session.connection()
+        trial_rows = self._fetch(connection, (
+            self._select([models.TrialModel.trial_id, models.TrialModel.number, models.TrialModel.state,
+                          models.TrialModel.datetime_start, models.TrialModel.datetime_complete])
+            .where(models.TrialModel.study_id == int(study_id))
+            .where(models.TrialModel.trial_id > int(after_trial_id))
+            .order_by(models.TrialModel.trial_id)
+            .limit(int(limit))
+        ))
+        if not trial_rows:
+            return []
+
+        first_trial_id, last_trial_id = trial_rows[0][0], trial_rows[-1][0]
+
+        def rows(*columns):
+            # the join leaves out the trials of other studies that fall into the id range
+            trial_id = columns[0]
+            return self._fetch(connection, (
+                self._select(columns)
+                .where(trial_id == models.TrialModel.trial_id)
+                .where(models.TrialModel.study_id == int(study_id))
+                .where(trial_id >= first_trial_id)
+                .where(trial_id <= last_trial_id)
+            ))
+
+        params = collections.defaultdict(dict)
+        distributions = collections.defaultdict(dict)
+        for trial_id, name, value, distribution_json in rows(
+                models.TrialParamModel.trial_id, models.TrialParamModel.param_name,
+                models.TrialParamModel.param_value, models.TrialParamModel.distribution_json):
+            distribution = self._distribution(distribution_json)
+            params[trial_id][name] = distribution.to_external_repr(value)
+            distributions[trial_id][name] = distribution
+
+        values = collections.defaultdict(dict)
+        value_model = models.TrialValueModel
+        if hasattr(value_model, 'value_type'):
+            # optuna>=3.0 stores infinite values as a type next to the value
+            value_types = _enum_members(value_model.TrialValueType)
+            for trial_id, objective, value, value_type in rows(value_model.trial_id, value_model.objective,
+                                                               value_model.value, value_model.value_type):
+                values[trial_id][objective] = value_model.stored_repr_to_value(value, value_types[value_type])
+        else:
+            for trial_id, objective, value in rows(value_model.trial_id, value_model.objective, value_model.value):
+                values[trial_id][objective] = value
+
+        intermediate_values = collections.defaultdict(dict)
+        intermediate_model = models.TrialIntermediateValueModel
+        if hasattr(intermediate_model, 'intermediate_value_type'):
+            value_types = _enum_members(intermediate_model.TrialIntermediateValueType)
+            for trial_id, step, value, value_type in rows(
+                    intermediate_model.trial_id, intermediate_model.step,
+                    intermediate_model.intermediate_value, intermediate_model.intermediate_value_type):
+                intermediate_values[trial_id][step] = intermediate_model.stored_repr_to_intermediate_value(
+                    value, value_types[value_type])
+        else:
+            for trial_id, step, value in rows(intermediate_model.trial_id, intermediate_model.step,
+                                              intermediate_model.intermediate_value):
+                intermediate_values[trial_id][step] = value
+
+        user_attrs = collections.defaultdict(dict)
+        for trial_id, key, value_json in rows(models.TrialUserAttributeModel.trial_id,
+                                              models.TrialUserAttributeModel.key,
+                                              models.TrialUserAttributeModel.value_json):
+            user_attrs[trial_id][key] = json.loads(value_json)
+
+        system_attrs = collections.defaultdict(dict)
+        for trial_id, key, value_json in rows(models.TrialSystemAttributeModel.trial_id,
+                                              models.TrialSystemAttributeModel.key,
+                                              models.TrialSystemAttributeModel.value_json):
+            system_attrs[trial_id][key] = json.loads(value_json)
+
+        frozen_trial = optuna.trial.FrozenTrial
+        states = _enum_members(optuna.trial.TrialState)
+        trials = []
+        for trial_id, number, state, datetime_start, datetime_complete in trial_rows:
+            trial_values = values.get(trial_id)
+            trials.append(frozen_trial(
+                number=number,
+                state=states[state],
+                value=None,
+                values=[trial_values[objective] for objective in sorted(trial_values)] if trial_values else None,
+                datetime_start=_as_datetime(datetime_start),
+                datetime_complete=_as_datetime(datetime_complete),
+                params=params.get(trial_id, {}),
+                distributions=distributions.get(trial_id, {}),
+                user_attrs=user_attrs.get(trial_id, {}),
+                system_attrs=system_attrs.get(trial_id, {}),
+                intermediate_values=intermediate_values.get(trial_id, {}),
+                trial_id=trial_id,
+            ))
+        return trials
+
+    @staticmethod
+    def _fetch(connection, statement) -> list:
+        # all parameters of the statements are integers, so they can be inlined
+        query = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(query)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _distribution(self, distribution_json: str):
+        distribution = self._distributions.get(distribution_json)
+        if distribution is None:
+            distribution = optuna.distributions.json_to_distribution(distribution_json)
+            self._distributions[distribution_json] = distribution
+        return distribution
+
+
+def _log_study(run, study: 'optuna.Study', study_format: str = 'pickle',
+               encoding: Optional['_ArtifactEncoding'] = None):
     try:
-        if type(study._storage) is optuna.storages._in_memory.InMemoryStorage:
-            """pickle and log the study object to the 'study/study.pkl' path"""
+        if _is_in_memory(study):
+            """serialize and log the study object to the 'study/study' path"""
             run['study/study_name'] = study.study_name
             run['study/storage_type'] = 'InMemoryStorage'
-            run['study/study'] = File.as_pickle(study)
-            pass
+            content, buffers, extension = None, [], 'pkl'
+            # InMemoryStorage guards its state with a lock; hold it so trials finishing concurrently
+            # (e.g. while the callback runs in async_mode) do not mutate the study mid-pickle
+            with getattr(study._storage, '_lock', None) or threading.RLock():
+                if study_format == 'columnar':
+                    try:
+                        content, extension = _study_to_columnar(study), 'npz'
+                    except (TypeError, ValueError) as e:
+                        warnings.warn(f'Logging the study as a pickle, it cannot be stored as columns: {e}')
+                        study_format = 'pickle'
+                if content is None:
+                    content, buffers = _dump_pickle(study, encoding)
+            _log_artifact(run, 'study/study', content, extension, encoding, buffers)
+            run['study/study_format'] = study_format
         else:
             run['study/study_name'] = study.study_name
             if isinstance(study._storage, optuna.storages.RedisStorage):
@@ -381,8 +1533,463 @@ def _log_study(run, study: optuna.Study):
         pass
 
 
+def _log_study_delta(run, study: 'optuna.Study', trials: List['optuna.trial.FrozenTrial'], seq: int,
+                     encoding: Optional['_ArtifactEncoding'] = None):
+    """pickle the trials finished since the previous snapshot to the 'study/snapshot/deltas/<seq>' path"""
+    delta = {
+        'trials': trials,
+        # trials started before later finished ones, which keep their numbers when the deltas are replayed
+        'running': study.get_trials(deepcopy=False,
+                                    states=(optuna.trial.TrialState.RUNNING, optuna.trial.TrialState.WAITING)),
+        'user_attrs': study.user_attrs,
+        'system_attrs': study.system_attrs,
+    }
+    content, buffers = _dump_pickle(delta, encoding)
+    _log_artifact(run, f'study/snapshot/deltas/{seq}', content, 'pkl', encoding, buffers)
+
+
+def _log_artifact(run, path: str, content: bytes, extension: str, encoding: Optional['_ArtifactEncoding'] = None,
+                  buffers: Iterable = ()):
+    content = _encode_artifact(content, encoding, buffers)
+    if content.startswith(_ARTIFACT_MAGIC):
+        extension = 'bin'
+    run[path] = File.from_content(content, extension=extension)
+    # the hash lets load_study_from_run find the artifact in its cache without downloading it
+    run[f'{path}_sha256'] = hashlib.sha256(content).hexdigest()
+
+
+_SyncState = collections.namedtuple('_SyncState', ['last_trial_id', 'open_trials', 'best_trial_ids'])
+
+
+class _TrialSync:
+    """Logs the trials of a study chunk by chunk, with `sync` only those that have finished since the previous sync.
+
+    What has been synced is kept under 'study/sync' of the run, see `log_study_metadata(sync=True)`. Without `sync`,
+    all trials are logged and nothing is kept.
+    """
+
+    def __init__(self, run: 'neptune.Run', base_namespace: str, study: 'optuna.Study', sync: bool):
+        # the sync state is read through the run itself, namespace handlers cannot tell whether a path exists
+        self.state = _read_sync_state(run, '/'.join(filter(None, [base_namespace, _SYNC_KEY])), study) \
+            if sync else None
+        self.synced_before = self.state is not None
+        if self.state is None:
+            self.state = _SyncState(last_trial_id=-1, open_trials={}, best_trial_ids=[])
+        self._run = run[base_namespace]
+        self._study = study
+        self._sync = sync
+        # only the new trials are read when syncing, on top of the best trials found by the previous sync
+        self.best_trials_tracker = _BestTrialsTracker(
+            study.directions, [study._storage.get_trial(trial_id) for trial_id in self.state.best_trial_ids])
+
+    def pending(self) -> int:
+        """Returns how many trials the next `log` reads."""
+        return _count_trials(self._study, self.state.last_trial_id) + len(self.state.open_trials)
+
+    def log(self, chunk_size: int, log_all_trials: bool = True,
+            log_distributions: bool = True) -> Iterator[Tuple[List['optuna.trial.FrozenTrial'], int]]:
+        """Yields, for every chunk, the trials that were logged and the number of trials that were read."""
+        chunks = _iter_trials(self._study, chunk_size, self.state.last_trial_id)
+        if self.state.open_trials:
+            chunks = itertools.chain(
+                [[self._study._storage.get_trial(trial_id) for trial_id in self.state.open_trials]], chunks)
+        for chunk in chunks:
+            n_read = len(chunk)
+            previous_state = self.state
+            if self._sync:
+                self.state, chunk = _advance_sync_state(self.state, chunk)
+            for trial in chunk:
+                self.best_trials_tracker.update(trial)
+            if log_all_trials and chunk:
+                _log_trials(self._run, chunk, chunk_size=len(chunk))
+            if log_distributions and chunk:
+                self._run['study/distributions'].log([trial.distributions for trial in chunk])
+            if self._sync:
+                self.state = self.state._replace(
+                    best_trial_ids=[trial._trial_id for trial in self.best_trials_tracker.best_trials])
+                if self.state != previous_state:
+                    _write_sync_state(self._run, self._study, self.state)
+            yield chunk, n_read
+
+
+def _enum_members(enum) -> dict:
+    # sqlalchemy stores enums by their name, the lookup also passes members through for drivers that convert them
+    members = {member.name: member for member in enum}
+    members.update({member: member for member in enum})
+    return members
+
+
+def _as_datetime(value) -> Optional[datetime.datetime]:
+    if type(value) is not str:
+        return value
+    # the format sqlalchemy stores datetimes in on SQLite
+    if hasattr(datetime.datetime, 'fromisoformat'):
+        return datetime.datetime.fromisoformat(value)
+    return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S')
+
+
+def _read_sync_state(run, path: str, study: 'optuna.Study') -> Optional[_SyncState]:
+    """Returns what a previous `log_study_metadata(sync=True)` has logged of the study to `path`, if anything."""
+    if not run.exists(f'{path}/digest'):
+        return None
+    last_trial_id = int(run[f'{path}/last_trial_id'].fetch())
+    open_trials = {int(trial_id): state for trial_id, state in json.loads(run[f'{path}/open_trials'].fetch())}
+    state = _SyncState(last_trial_id, open_trials, json.loads(run[f'{path}/best_trial_ids'].fetch()))
+    if run[f'{path}/digest'].fetch() != _sync_digest(study, state):
+        warnings.warn(f"'{path}' was logged for another study or is corrupt, logging all trials again")
+        return None
+    return state
+
+
+def _advance_sync_state(state: _SyncState, trials: List['optuna.trial.FrozenTrial']):
+    """Returns the sync state after reading `trials`, and those of them to log.
+
+    Optuna does not change a trial once it has finished, so a trial is logged exactly once, when it is first read
+    in a finished state. Trials that are still running are kept in the state to be read again.
+    """
+    last_trial_id, open_trials = state.last_trial_id, dict(state.open_trials)
+    finished = []
+    for trial in trials:
+        last_trial_id = max(last_trial_id, trial._trial_id)
+        if trial.state.is_finished():
+            open_trials.pop(trial._trial_id, None)
+            finished.append(trial)
+        else:
+            open_trials[trial._trial_id] = trial.state.name
+    return state._replace(last_trial_id=last_trial_id, open_trials=open_trials), finished
+
+
+def _write_sync_state(run, study: 'optuna.Study', state: _SyncState):
+    run[_SYNC_KEY] = {
+        'last_trial_id': state.last_trial_id,
+        'open_trials': json.dumps(sorted(state.open_trials.items())),
+        'best_trial_ids': json.dumps(state.best_trial_ids),
+        'digest': _sync_digest(study, state),
+    }
+
+
+def _sync_digest(study: 'optuna.Study', state: _SyncState) -> str:
+    # ties the sync state to the study, so that syncing another study into the same run starts over
+    key = [study.study_name, getattr(study, '_study_id', None), state.last_trial_id,
+           sorted(state.open_trials.items()), state.best_trial_ids]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+_ArtifactEncoding = collections.namedtuple('_ArtifactEncoding', ['compression', 'level', 'pickle_protocol'])
+
+
+def _artifact_encoding(compression: Optional[str] = None, level: Optional[int] = None,
+                       pickle_protocol: Optional[int] = None) -> _ArtifactEncoding:
+    if compression is not None and compression not in ARTIFACT_COMPRESSIONS:
+        raise ValueError(f'study_compression must be one of {ARTIFACT_COMPRESSIONS}, got {compression!r}')
+    if level is not None and not 0 <= level <= 9:
+        raise ValueError(f'study_compression_level must be between 0 and 9, got {level}')
+    if pickle_protocol is not None and not 0 <= pickle_protocol <= pickle.HIGHEST_PROTOCOL:
+        raise ValueError(f'study_pickle_protocol must be between 0 and {pickle.HIGHEST_PROTOCOL}, '
+                         f'got {pickle_protocol}')
+    return _ArtifactEncoding(compression, level, pickle_protocol)
+
+
+def _dump_pickle(obj, encoding: Optional[_ArtifactEncoding] = None) -> Tuple[bytes, list]:
+    protocol = encoding.pickle_protocol if encoding is not None else None
+    if protocol is None or protocol < 5:
+        return pickle.dumps(obj, protocol=protocol), []
+    buffers = []
+    content = pickle.dumps(obj, protocol=protocol, buffer_callback=buffers.append)
+    return content, [buffer.raw() for buffer in buffers]
+
+
+def _encode_artifact(content: bytes, encoding: Optional[_ArtifactEncoding] = None, buffers: Iterable = ()) -> bytes:
+    """Wraps the payload and its out-of-band buffers in a self-describing, optionally compressed envelope.
+
+    The envelope is the magic bytes, the length of a JSON header (4 bytes, big endian), the header naming the
+    compression and the length of every section, and the sections: the payload followed by the buffers.
+    Payloads that are neither compressed nor come with buffers are uploaded as they are.
+    """
+    buffers = list(buffers)
+    compression = encoding.compression if encoding is not None else None
+    if compression is None and not buffers:
+        return content
+
+    compress = _compressor(compression, encoding.level)
+    sections = [compress(section) for section in [content] + buffers]
+    header = json.dumps({
+        'version': _ARTIFACT_VERSION,
+        'compression': compression,
+        'sections': [len(section) for section in sections],
+    }).encode('utf-8')
+    return b''.join([_ARTIFACT_MAGIC, struct.pack('>I', len(header)), header] + sections)
+
+
+def _decode_artifact(content: bytes) -> Tuple[bytes, list]:
+    if not content.startswith(_ARTIFACT_MAGIC):
+        # logged as it is, e.g. a plain pickle
+        return content, []
+
+    offset = len(_ARTIFACT_MAGIC)
+    (header_length,) = struct.unpack_from('>I', content, offset)
+    offset += 4
+    header = json.loads(content[offset:offset + header_length].decode('utf-8'))
+    offset += header_length
+    if header.get('version', 0) > _ARTIFACT_VERSION:
+        raise ValueError(f'Unsupported artifact version {header.get("version")}, upgrade neptune-optuna')
+
+    decompress = _decompressor(header['compression'])
+    view = memoryview(content)
+    sections = []
+    for length in header['sections']:
+        sections.append(decompress(view[offset:offset + length]))
+        offset += length
+    # out-of-band buffers back e.g. NumPy arrays, which have to stay writable after unpickling
+    return sections[0], [bytearray(section) for section in sections[1:]]
+
+
+def _compressor(compression: Optional[str], level: Optional[int] = None):
+    if compression is None:
+        return lambda data: data
+    if compression == 'zlib':
+        return lambda data: zlib.compress(data, level if level is not None else zlib.Z_DEFAULT_COMPRESSION)
+    if compression == 'lzma':
+        import lzma
+
+        return lambda data: lzma.compress(data, preset=level)
+    raise ValueError(f'Unknown compression {compression!r}')
+
+
+def _decompressor(compression: Optional[str]):
+    if compression is None:
+        return bytes
+    if compression == 'zlib':
+        return zlib.decompress
+    if compression == 'lzma':
+        import lzma
+
+        return lzma.decompress
+    raise ValueError(f'Unknown compression {compression!r}')
+
+
+def _replay_study_deltas(study: 'optuna.Study', deltas: Iterable[dict]) -> 'optuna.Study':
+    # Finished trials never change again, so applying them on top of a newer base is harmless. Trials are keyed
+    # by number to overwrite ones still running in the base, and the trials still running when a delta was logged
+    # fill the numbers between finished ones until they finish themselves.
+    trials = {trial.number: trial for trial in study.get_trials(deepcopy=False)}
+    user_attrs = dict(study.user_attrs)
+    system_attrs = dict(study.system_attrs)
+    for delta in deltas:
+        for trial in delta.get('running', ()):
+            if trial.number not in trials or not trials[trial.number].state.is_finished():
+                trials[trial.number] = trial
+        trials.update((trial.number, trial) for trial in delta['trials'])
+        user_attrs.update(delta['user_attrs'])
+        system_attrs.update(delta['system_attrs'])
+
+    missing = sorted(set(range(len(trials))).symmetric_difference(trials))
+    if missing:
+        # the in-memory storage numbers trials by position, a gap would renumber the trials after it
+        raise ValueError(f'Incremental study snapshot is missing trial {missing[0]}')
+
+    replayed = _in_memory_study(study.study_name, study.directions, [trials[number] for number in sorted(trials)],
+                                sampler=study.sampler, pruner=study.pruner)
+    for key, value in user_attrs.items():
+        replayed._storage.set_study_user_attr(replayed._study_id, key, value)
+    for key, value in system_attrs.items():
+        replayed._storage.set_study_system_attr(replayed._study_id, key, value)
+
+    return replayed
+
+
+def _study_to_columnar(study: 'optuna.Study') -> bytes:
+    """Stores the trials as NumPy columns and the rest of the study in a JSON header, in a single .npz archive."""
+    import numpy as np
+
+    trials = study.get_trials(deepcopy=False)
+    n_trials = len(trials)
+    numbers = np.empty(n_trials, dtype=np.int64)
+    states = np.empty(n_trials, dtype=np.int8)
+    values = np.full((n_trials, len(study.directions)), np.nan)
+    has_values = np.zeros(n_trials, dtype=bool)
+    datetime_start = np.full(n_trials, _MISSING_TIMESTAMP, dtype=np.int64)
+    datetime_complete = np.full(n_trials, _MISSING_TIMESTAMP, dtype=np.int64)
+    intermediate_offsets = np.zeros(n_trials + 1, dtype=np.int64)
+    intermediate_steps, intermediate_values = [], []
+    params = {}
+    trial_user_attrs, trial_system_attrs = [], []
+
+    for i, trial in enumerate(trials):
+        numbers[i] = trial.number
+        states[i] = trial.state.value
+        if trial.values is not None:
+            values[i] = trial.values
+            has_values[i] = True
+        if trial.datetime_start is not None:
+            datetime_start[i] = _to_microseconds(trial.datetime_start)
+        if trial.datetime_complete is not None:
+            datetime_complete[i] = _to_microseconds(trial.datetime_complete)
+        for name, value in trial.params.items():
+            if name not in params:
+                params[name] = _ParamColumn(n_trials)
+            params[name].set(i, value, trial.distributions[name])
+        intermediate_steps.extend(trial.intermediate_values.keys())
+        intermediate_values.extend(trial.intermediate_values.values())
+        intermediate_offsets[i + 1] = len(intermediate_steps)
+        trial_user_attrs.append(trial.user_attrs)
+        trial_system_attrs.append(trial.system_attrs)
+
+    header = {
+        'format': _COLUMNAR_FORMAT,
+        'version': _COLUMNAR_VERSION,
+        'study_name': study.study_name,
+        'directions': [direction.name for direction in study.directions],
+        'user_attrs': study.user_attrs,
+        'system_attrs': study.system_attrs,
+        'params': [{'name': name, 'distributions': column.distributions} for name, column in params.items()],
+        'trial_user_attrs': trial_user_attrs,
+        'trial_system_attrs': trial_system_attrs,
+    }
+    columns = {
+        'header': np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+        'number': numbers,
+        'state': states,
+        'values': values,
+        'has_values': has_values,
+        'datetime_start': datetime_start,
+        'datetime_complete': datetime_complete,
+        'intermediate_offsets': intermediate_offsets,
+        'intermediate_steps': np.array(intermediate_steps, dtype=np.int64),
+        'intermediate_values': np.array(intermediate_values, dtype=np.float64),
+    }
+    for index, column in enumerate(params.values()):
+        columns[f'param_{index}'] = column.values
+        columns[f'param_{index}_distribution'] = column.distribution
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    return buffer.getvalue()
+
+
+def _study_from_columnar(content: bytes) -> 'optuna.Study':
+    import numpy as np
+
+    with np.load(io.BytesIO(content), allow_pickle=False) as archive:
+        columns = {name: archive[name] for name in archive.files}
+    header = json.loads(columns['header'].tobytes().decode('utf-8'))
+    if header.get('format') != _COLUMNAR_FORMAT or header.get('version', 0) > _COLUMNAR_VERSION:
+        raise ValueError(f'Unsupported study snapshot format {header.get("format")} {header.get("version")}')
+
+    param_columns = []
+    for index, param in enumerate(header['params']):
+        distributions = [optuna.distributions.json_to_distribution(d) for d in param['distributions']]
+        param_columns.append((param['name'], distributions, columns[f'param_{index}'].tolist(),
+                              columns[f'param_{index}_distribution'].tolist()))
+
+    numbers = columns['number'].tolist()
+    states = columns['state'].tolist()
+    values = columns['values'].tolist()
+    has_values = columns['has_values'].tolist()
+    datetime_start = columns['datetime_start'].tolist()
+    datetime_complete = columns['datetime_complete'].tolist()
+    offsets = columns['intermediate_offsets'].tolist()
+    steps = columns['intermediate_steps'].tolist()
+    intermediate_values = columns['intermediate_values'].tolist()
+
+    frozen_trial = optuna.trial.FrozenTrial
+    trial_states = {state.value: state for state in optuna.trial.TrialState}
+    trials = []
+    for i, number in enumerate(numbers):
+        params, distributions = {}, {}
+        for name, param_distributions, param_values, param_distribution in param_columns:
+            if param_distribution[i] >= 0:
+                distribution = param_distributions[param_distribution[i]]
+                distributions[name] = distribution
+                params[name] = distribution.to_external_repr(param_values[i])
+        trials.append(frozen_trial(
+            number=number,
+            state=trial_states[states[i]],
+            value=None,
+            values=values[i] if has_values[i] else None,
+            datetime_start=_from_microseconds(datetime_start[i]),
+            datetime_complete=_from_microseconds(datetime_complete[i]),
+            params=params,
+            distributions=distributions,
+            user_attrs=header['trial_user_attrs'][i],
+            system_attrs=header['trial_system_attrs'][i],
+            intermediate_values=dict(zip(steps[offsets[i]:offsets[i + 1]],
+                                         intermediate_values[offsets[i]:offsets[i + 1]])),
+            trial_id=i,
+        ))
+
+    directions = [optuna.study.StudyDirection[direction] for direction in header['directions']]
+    study = _in_memory_study(header['study_name'], directions, trials, copy_trials=False)
+    for key, value in header['user_attrs'].items():
+        study._storage.set_study_user_attr(study._study_id, key, value)
+    for key, value in header['system_attrs'].items():
+        study._storage.set_study_system_attr(study._study_id, key, value)
+    return study
+
+
+class _ParamColumn:
+    """Internal representations of one param, plus which of its distributions each trial used (-1 if none)."""
+
+    def __init__(self, n_trials: int):
+        import numpy as np
+
+        self.values = np.full(n_trials, np.nan)
+        self.distribution = np.full(n_trials, -1, dtype=np.int32)
+        self.distributions = []
+        self._indices = {}
+
+    def set(self, i: int, value, distribution):
+        # for a categorical distribution the internal representation is the index of the choice
+        self.values[i] = distribution.to_internal_repr(value)
+        index = self._indices.get(distribution)
+        if index is None:
+            index = self._indices[distribution] = len(self.distributions)
+            self.distributions.append(optuna.distributions.distribution_to_json(distribution))
+        self.distribution[i] = index
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _to_microseconds(value: datetime.datetime) -> int:
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _from_microseconds(value: int) -> Optional[datetime.datetime]:
+    if value == _MISSING_TIMESTAMP:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+def _in_memory_study(study_name, directions, trials: Iterable['optuna.trial.FrozenTrial'], sampler=None, pruner=None,
+                     copy_trials=True):
+    storage = optuna.storages.InMemoryStorage()
+    study = optuna.create_study(storage=storage, study_name=study_name, directions=directions,
+                                sampler=sampler, pruner=pruner)
+    if not copy_trials and hasattr(storage, '_trial_id_to_study_id_and_number'):
+        _insert_trials(storage, study._study_id, trials)
+    else:
+        for trial in trials:
+            # bypasses Study.add_trial validation so that unfinished trials are kept as they are
+            storage.create_new_trial(study._study_id, template_trial=trial)
+    return study
+
+
+def _insert_trials(storage, study_id: int, trials: Iterable['optuna.trial.FrozenTrial']):
+    # the bookkeeping of InMemoryStorage.create_new_trial, without deep-copying trials that nothing else refers to
+    with storage._lock:
+        study_trials = storage._studies[study_id].trials
+        for trial in trials:
+            storage._max_trial_id += 1
+            trial.number = len(study_trials)
+            trial._trial_id = storage._max_trial_id
+            storage._trial_id_to_study_id_and_number[trial._trial_id] = (study_id, trial.number)
+            study_trials.append(trial)
+            storage._update_cache(trial._trial_id, study_id)
+
+
 def _log_plots(run,
-               study: optuna.Study,
+               study: 'optuna.Study',
                visualization_backend='plotly',
                log_plot_contour=True,
                log_plot_edf=True,
@@ -392,106 +1999,798 @@ def _log_plots(run,
                log_plot_slice=True,
                log_plot_intermediate_values=True,
                log_plot_optimization_history=True,
+               plot_payload='standalone',
                ):
+    if plot_payload == 'json' and not _exists(run, PLOTLY_ASSET_KEY):
+        _log_plotly_asset(run)
+
+    plot_names = _plots_to_log(study,
+                               visualization_backend=visualization_backend,
+                               log_plot_contour=log_plot_contour,
+                               log_plot_edf=log_plot_edf,
+                               log_plot_parallel_coordinate=log_plot_parallel_coordinate,
+                               log_plot_param_importances=log_plot_param_importances,
+                               log_plot_pareto_front=log_plot_pareto_front,
+                               log_plot_slice=log_plot_slice,
+                               log_plot_intermediate_values=log_plot_intermediate_values,
+                               log_plot_optimization_history=log_plot_optimization_history)
+    _render_and_log_plots(run, study, plot_names, visualization_backend, plot_payload=plot_payload)
+
+
+def _render_and_log_plots(run, study: 'optuna.Study', plot_names: List[str], visualization_backend='plotly',
+                          plot_payload='standalone', cost_model=None, sampled_study: Optional['optuna.Study'] = None,
+                          plot_kwargs: Optional[dict] = None, stage_timer=None):
+    vis = _visualization_module(visualization_backend)
+    for plot_name in plot_names:
+        plot_study = sampled_study if sampled_study is not None and plot_name in SAMPLED_PLOTS else study
+        plot, seconds = _render_plot(vis, plot_name, plot_study, plot_payload, (plot_kwargs or {}).get(plot_name))
+        _log_rendered_plot(run, plot_name, plot, seconds, cost_model, stage_timer)
+
+
+def _log_plotly_asset(run):
+    from plotly.offline import get_plotlyjs
+
+    run[PLOTLY_ASSET_KEY] = File.from_content(get_plotlyjs(), extension='js')
+
+
+def _exists(run, path: str) -> bool:
+    """`run.exists(path)`, also for the namespace handlers returned by `run[base_namespace]`, which lack `exists`."""
+    if hasattr(run, 'exists'):
+        return run.exists(path)
+    # neptune-client>=1.0.0 renamed the run of a handler to its container
+    root = getattr(run, '_container', None) or run._run
+    return root.exists('/'.join(part for part in (run._path, path) if part))
+
+
+def _plot_to_file(figure, plot_payload='standalone') -> 'File':
+    if plot_payload == 'standalone':
+        return neptune.types.File.as_html(figure)
+
+    from plotly.graph_objects import Figure
+
+    if not isinstance(figure, Figure):
+        return neptune.types.File.as_html(figure)
+    if plot_payload == 'cdn':
+        # the CDN URL is pinned to the installed plotly version
+        return File.from_content(figure.to_html(include_plotlyjs='cdn'), extension='html')
+    return File.from_content(gzip.compress(figure.to_json().encode('utf-8')), extension='json.gz')
+
+
+def _log_rendered_plot(run, plot_name: str, plot: Optional['File'], seconds: float, cost_model=None,
+                       stage_timer=None):
+    run[f'visualizations/render_time/{plot_name}'].log(seconds)
+    if cost_model is not None:
+        cost_model.record(plot_name, seconds)
+    if stage_timer is not None:
+        stage_timer.add(f'plots/{plot_name}', seconds)
+    if plot is not None:
+        run[f'visualizations/{plot_name}'] = plot
+
+
+def _visualization_module(visualization_backend):
     if visualization_backend == 'matplotlib':
         import optuna.visualization.matplotlib as vis
     elif visualization_backend == 'plotly':
         import optuna.visualization as vis
     else:
         raise NotImplementedError(f'{visualization_backend} visualisation backend is not implemented')
+    return vis
+
+
+def _plots_to_log(study: 'optuna.Study',
+                  visualization_backend='plotly',
+                  log_plot_contour=True,
+                  log_plot_edf=True,
+                  log_plot_parallel_coordinate=True,
+                  log_plot_param_importances=True,
+                  log_plot_pareto_front=True,
+                  log_plot_slice=True,
+                  log_plot_intermediate_values=True,
+                  log_plot_optimization_history=True,
+                  ) -> List[str]:
+    """Names of the enabled `optuna.visualization` plots that can be drawn for the study in its current state."""
+    vis = _visualization_module(visualization_backend)
+    if not vis.is_available():
+        return []
+
+    trials = study.get_trials(deepcopy=False)
+    params = list(p_name for t in trials for p_name in t.params.keys())
+    finished_states = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED,)
+    # the plots of a single objective need a `target` to be drawn for a multi-objective study
+    single_objective = not study._is_multi_objective()
+
+    plot_names = []
+    if log_plot_contour and single_objective and any(params):
+        plot_names.append('plot_contour')
+    if log_plot_edf and single_objective:
+        plot_names.append('plot_edf')
+    if log_plot_parallel_coordinate and single_objective:
+        plot_names.append('plot_parallel_coordinate')
+    if log_plot_param_importances and single_objective \
+            and len([t for t in trials if t.state in finished_states]) > 1:
+        plot_names.append('plot_param_importances')
+    if log_plot_pareto_front and not single_objective and visualization_backend == 'plotly':
+        plot_names.append('plot_pareto_front')
+    if log_plot_slice and single_objective and any(params):
+        plot_names.append('plot_slice')
+    if log_plot_intermediate_values and any(t.intermediate_values for t in trials):
+        # Intermediate values plot if available only if the above condition is met
+        plot_names.append('plot_intermediate_values')
+    if log_plot_optimization_history and single_objective:
+        plot_names.append('plot_optimization_history')
+    return plot_names
+
+
+# errors after which a plot is skipped instead of failing the whole logging
+_PLOT_ERRORS = {
+    # Unable to compute importances
+    'plot_param_importances': (RuntimeError, ValueError, ZeroDivisionError),
+}
+
+
+def _render_plot(vis, plot_name: str, study: 'optuna.Study', plot_payload='standalone',
+                 plot_kwargs: Optional[dict] = None) -> Tuple[Optional['File'], float]:
+    """Draws one plot and returns it together with the seconds it took."""
+    start = time.monotonic()
+    try:
+        plot = _plot_to_file(getattr(vis, plot_name)(study, **(plot_kwargs or {})), plot_payload)
+    except _PLOT_ERRORS.get(plot_name, ()):
+        plot = None
+    return plot, time.monotonic() - start
 
-    if vis.is_available:
-        params = list(p_name for t in study.trials for p_name in t.params.keys())
 
-        if log_plot_contour and any(params):
-            run['visualizations/plot_contour'] = neptune.types.File.as_html(vis.plot_contour(study))
+class _ParamImportancesCache:
+    """Computes the parameter importances again only when enough new trials completed since the last fit.
 
-        if log_plot_edf:
-            run['visualizations/plot_edf'] = neptune.types.File.as_html(vis.plot_edf(study))
+    Complete trials are never removed from a study, so their count identifies the set the importances were
+    computed on. Refitting once the count grows by `refit_fraction` means only O(log n) fits over a sweep.
+    """
 
-        if log_plot_parallel_coordinate:
-            run['visualizations/plot_parallel_coordinate'] = \
-                neptune.types.File.as_html(vis.plot_parallel_coordinate(study))
+    def __init__(self, evaluator=None, refit_fraction: float = 0.1, max_trials: Optional[int] = None, seed=None):
+        self._evaluator = evaluator
+        self._refit_fraction = refit_fraction
+        self._max_trials = max_trials
+        self._random = random.Random(seed)
+        self._n_fitted = None
+        self._importances = None
 
-        if log_plot_param_importances and len(study.get_trials(states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED,))) > 1:
-            try:
-                run['visualizations/plot_param_importances'] = neptune.types.File.as_html(vis.plot_param_importances(study))
-            except (RuntimeError, ValueError, ZeroDivisionError):
-                # Unable to compute importances
-                pass
+    def get(self, study: 'optuna.Study'):
+        """Returns the importances, or `None` if they cannot be computed for the study."""
+        trials = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+        if self._n_fitted is not None and len(trials) < self._n_fitted * (1 + self._refit_fraction):
+            return self._importances
 
-        if log_plot_pareto_front and study._is_multi_objective() and visualization_backend == 'plotly':
-            run['visualizations/plot_pareto_front'] = neptune.types.File.as_html(vis.plot_pareto_front(study))
+        self._n_fitted = len(trials)
+        if self._max_trials is not None and len(trials) > self._max_trials:
+            trials = sorted(self._random.sample(trials, self._max_trials), key=lambda trial: trial.number)
+            study = _in_memory_study(study.study_name, study.directions, trials)
+        try:
+            self._importances = optuna.importance.get_param_importances(study, evaluator=self._evaluator)
+        except _PLOT_ERRORS['plot_param_importances']:
+            self._importances = None
+        return self._importances
 
-        if log_plot_slice and any(params):
-            run['visualizations/plot_slice'] = neptune.types.File.as_html(vis.plot_slice(study))
 
-        if log_plot_intermediate_values and any(trial.intermediate_values for trial in study.trials):
-            # Intermediate values plot if available only if the above condition is met
-            run['visualizations/plot_intermediate_values'] = \
-                neptune.types.File.as_html(vis.plot_intermediate_values(study))
+_PrecomputedImportances = None
 
-        if log_plot_optimization_history:
-            run['visualizations/plot_optimization_history'] = \
-                neptune.types.File.as_html(vis.plot_optimization_history(study))
 
+def _precomputed_importances(importances):
+    """Hands cached importances to `plot_param_importances` instead of evaluating them again.
 
-def _log_best_trials(study: optuna.Study):
-    if not study.best_trials:
+    The evaluator has to derive from optuna's base class, so the class is only defined on first use.
+    """
+    global _PrecomputedImportances
+    if _PrecomputedImportances is None:
+        class _PrecomputedImportances(optuna.importance.BaseImportanceEvaluator):
+            def __init__(self, importances):
+                self._importances = importances
+
+            def __reduce__(self):
+                return _precomputed_importances, (self._importances,)
+
+            def evaluate(self, study, params=None, *, target=None):
+                if params is None:
+                    return self._importances
+                return collections.OrderedDict(
+                    (name, value) for name, value in self._importances.items() if name in params)
+
+    return _PrecomputedImportances(importances)
+
+
+class _IncrementalPlots:
+    """Draws the optimization history and the intermediate values as series, appending only the new trials."""
+
+    def __init__(self, run, log_optimization_history=True, log_intermediate_values=True):
+        self._run = run
+        self._log_optimization_history = log_optimization_history
+        self._log_intermediate_values = log_intermediate_values
+        self._best_value = None
+        self._seeded = False
+
+    def log(self, study: 'optuna.Study', trials: List['optuna.trial.FrozenTrial']):
+        """Appends `trials` to the series.
+
+        The best value starts from the complete trials numbered below the first batch, which a resumed study
+        already has. Later trials, e.g. still queued in async mode, are only counted once they are appended.
+        """
+        if study._is_multi_objective():
+            return  # neither plot is defined for multi-objective studies
+
+        maximize = study.direction == optuna.study.StudyDirection.MAXIMIZE
+        if not self._seeded and trials:
+            self._seeded = True
+            first_number = min(trial.number for trial in trials)
+            earlier_values = [trial.value for trial in study.get_trials(deepcopy=False,
+                                                                         states=(optuna.trial.TrialState.COMPLETE,))
+                              if trial.number < first_number and trial.value is not None]
+            if earlier_values:
+                self._best_value = max(earlier_values) if maximize else min(earlier_values)
+        values, best_values = [], []
+        for trial in trials:
+            if self._log_intermediate_values and trial.intermediate_values:
+                steps = sorted(trial.intermediate_values)
+                _extend_series(self._run[f'visualizations/intermediate_values/{trial.number}'],
+                               [trial.intermediate_values[step] for step in steps], steps)
+
+            if trial.state != optuna.trial.TrialState.COMPLETE or trial.value is None:
+                continue
+            if self._best_value is None or (trial.value > self._best_value if maximize
+                                            else trial.value < self._best_value):
+                self._best_value = trial.value
+            values.append(trial.value)
+            best_values.append(self._best_value)
+
+        if self._log_optimization_history and values:
+            # steps are left implicit, trials running in parallel do not finish in the order of their numbers
+            self._run['visualizations/optimization_history/value'].log(values)
+            self._run['visualizations/optimization_history/best_value'].log(best_values)
+
+
+class _TrialSampler:
+    """Picks at most `max_trials` complete trials to draw instead of the whole study.
+
+    The sample always holds the best and the most recent trials, and the rest is spread evenly over the quantiles
+    of the (first) objective. The complete trials of the study are read once, on the first observed trial, and then
+    kept sorted by objective as they arrive, so that a sample is drawn without sorting the study on every refresh.
+    """
+
+    def __init__(self, max_trials: int):
+        if max_trials < 3:
+            raise ValueError(f'plot_max_trials must be at least 3, got {max_trials}')
+        self._max_trials = max_trials
+        self._n_best = max(max_trials // 10, 1)
+        self._n_recent = max(max_trials // 10, 1)
+        self._by_value = None
+        self._recent = collections.deque(maxlen=self._n_recent)
+
+    def observe(self, study: 'optuna.Study', trial: 'optuna.trial.FrozenTrial'):
+        if self._by_value is None:
+            # a resumed study has complete trials, the best ones among them, that the callback never saw
+            seen = self._seed(study)
+        else:
+            seen = ()
+        if trial.state != optuna.trial.TrialState.COMPLETE or trial.values is None or trial.number in seen:
+            return
+        bisect.insort(self._by_value, (self._sign(study) * trial.values[0], trial.number))
+        self._recent.append(trial.number)
+
+    def _seed(self, study: 'optuna.Study') -> Set[int]:
+        trials = [trial for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+                  if trial.values is not None]
+        sign = self._sign(study)
+        self._by_value = sorted((sign * trial.values[0], trial.number) for trial in trials)
+        self._recent.extend(sorted(trial.number for trial in trials)[-self._n_recent:])
+        return {trial.number for trial in trials}
+
+    @staticmethod
+    def _sign(study: 'optuna.Study') -> int:
+        return -1 if study.directions[0] == optuna.study.StudyDirection.MAXIMIZE else 1
+
+    def sample(self, study: 'optuna.Study') -> Optional[List['optuna.trial.FrozenTrial']]:
+        """Returns the sampled trials ordered by number, or `None` if all trials fit into the budget."""
+        if self._by_value is None or len(self._by_value) <= self._max_trials:
+            return None
+
+        numbers = {number for _, number in self._by_value[:self._n_best]}
+        numbers.update(self._recent)
+        n_rest = self._max_trials - len(numbers)
+        if n_rest > 0:
+            # spread over the trials not picked yet, so that the sample is filled up to max_trials
+            rest = [number for _, number in self._by_value if number not in numbers]
+            last = len(rest) - 1
+            numbers.update(rest[round(i * last / max(n_rest - 1, 1))] for i in range(n_rest))
+
+        return [trial for trial in study.get_trials(deepcopy=False) if trial.number in numbers]
+
+
+class _StudyFingerprint:
+    """Summarizes, from the finished trials seen so far, the inputs each plot depends on.
+
+    Two equal fingerprints of a plot mean that rendering it again would draw the same figure.
+    """
+
+    def __init__(self):
+        self._n_complete = 0
+        self._n_finished = 0
+        self._n_intermediate_values = 0
+        self._params = set()
+
+    def observe(self, trial: 'optuna.trial.FrozenTrial'):
+        self._n_finished += 1
+        self._n_intermediate_values += len(trial.intermediate_values)
+        if trial.state == optuna.trial.TrialState.COMPLETE:
+            self._n_complete += 1
+            self._params.update(trial.params)
+
+    def of(self, plot_name: str):
+        if plot_name == 'plot_intermediate_values':
+            return self._n_finished, self._n_intermediate_values
+        if plot_name in ('plot_contour', 'plot_parallel_coordinate', 'plot_param_importances', 'plot_slice'):
+            return self._n_complete, frozenset(self._params)
+        # plot_edf, plot_optimization_history and plot_pareto_front only draw the values of complete trials,
+        # so their count also covers changes of the best value
+        return self._n_complete,
+
+
+class _StudyLease:
+    """A lease on the refresh duties of the workers logging one study to one run, kept in the study system attrs.
+
+    The storages offer no compare-and-set, so a free or expired lease is taken by writing it and reading it back:
+    of the workers racing for it, the last writer wins. A worker that lost the race after reading back its own
+    write keeps acting as the holder until it next renews the lease, after half of `seconds` at most.
+    """
+
+    def __init__(self, key: str, seconds: float):
+        self._key = key
+        self._seconds = seconds
+        self._owner = uuid.uuid4().hex
+        self._expires = 0.0
+
+    def acquire(self, study: 'optuna.Study') -> bool:
+        """Takes or renews the lease, returns whether this worker holds it."""
+        now = time.time()
+        if self._expires - now > self._seconds / 2:
+            return True
+        lease = self._read(study)
+        if lease is not None and lease['owner'] != self._owner and lease['expires'] > now:
+            self._expires = 0.0
+            return False
+        self._write(study, now + self._seconds)
+        lease = self._read(study)
+        if lease is None or lease['owner'] != self._owner:
+            self._expires = 0.0
+            return False
+        self._expires = now + self._seconds
+        return True
+
+    def release(self, study: 'optuna.Study'):
+        """Lets the next worker take the lease right away instead of waiting for it to expire."""
+        lease = self._read(study)
+        if lease is not None and lease['owner'] == self._owner:
+            self._write(study, 0.0)
+        self._expires = 0.0
+
+    def _read(self, study):
+        return study._storage.get_study_system_attrs(study._study_id).get(self._key)
+
+    def _write(self, study, expires):
+        study._storage.set_study_system_attr(study._study_id, self._key, {'owner': self._owner, 'expires': expires})
+
+
+class _PlotCostModel:
+    """Spreads a per-refresh time budget over the plots according to how long each of them takes to render.
+
+    Every refresh, each plot earns an equal share of the budget as credit and is rendered once its credit covers
+    its estimated cost, which is a moving average of its render times. Plots cheaper than their share are rendered
+    on every refresh, expensive ones proportionally less often, so on average a refresh stays within the budget.
+    """
+
+    def __init__(self, budget: float, smoothing: float = 0.3):
+        self._budget = budget
+        self._smoothing = smoothing
+        self._lock = threading.Lock()
+        self.costs = {}
+        self._credits = collections.defaultdict(float)
+
+    def select(self, plot_names: List[str]) -> List[str]:
+        if not plot_names:
+            return []
+        share = self._budget / len(plot_names)
+        selected = []
+        with self._lock:
+            for plot_name in plot_names:
+                self._credits[plot_name] += share
+                cost = self.costs.get(plot_name)
+                if cost is None or self._credits[plot_name] >= cost:
+                    # plots that were never timed are rendered right away to learn their cost
+                    self._credits[plot_name] = max(self._credits[plot_name] - (cost or 0.0), 0.0)
+                    selected.append(plot_name)
+        return selected
+
+    def record(self, plot_name: str, seconds: float):
+        with self._lock:
+            cost = self.costs.get(plot_name)
+            self.costs[plot_name] = seconds if cost is None else cost + self._smoothing * (seconds - cost)
+
+
+def _trials_snapshot(trials: List['optuna.trial.FrozenTrial']) -> bytes:
+    """Pickles the fields of the trials that the plots read, once per refresh for all of its render jobs."""
+    return pickle.dumps([(trial.number, trial.state, trial.values, trial.params, trial.distributions,
+                          trial.intermediate_values, trial.datetime_start, trial.datetime_complete)
+                         for trial in trials], protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _trials_from_snapshot(snapshot: bytes) -> List['optuna.trial.FrozenTrial']:
+    return [optuna.trial.FrozenTrial(number=number, state=state, value=None, values=values, params=params,
+                                     distributions=distributions, intermediate_values=intermediate_values,
+                                     datetime_start=datetime_start, datetime_complete=datetime_complete,
+                                     user_attrs={}, system_attrs={}, trial_id=number)
+            for number, state, values, params, distributions, intermediate_values, datetime_start, datetime_complete
+            in pickle.loads(snapshot)]
+
+
+# the study last rebuilt by this plot process, the other plots of the same refresh are drawn from it as well
+_snapshot_study = (None, None)
+
+
+def _render_plot_from_snapshot(visualization_backend, plot_payload, plot_name, study_name, directions,
+                               snapshot_key, snapshot: bytes, plot_kwargs=None):
+    """Runs in a plot pool process; rebuilds the study from a trials snapshot and draws one plot."""
+    global _snapshot_study
+    if _snapshot_study[0] != snapshot_key:
+        _snapshot_study = (snapshot_key, _in_memory_study(study_name, directions, _trials_from_snapshot(snapshot),
+                                                          copy_trials=False))
+    return _render_plot(_visualization_module(visualization_backend), plot_name, _snapshot_study[1], plot_payload,
+                        plot_kwargs)
+
+
+def _plot_process_context():
+    """Starts plot processes without forking this one, whose neptune threads (and async worker) could deadlock a fork.
+
+    Where available, the processes are forked from a forkserver that has already imported optuna and neptune, so
+    that each of them does not pay for the imports again.
+    """
+    import multiprocessing
+
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # only applies if the forkserver of this process has not been started yet
+    context.set_forkserver_preload(['optuna', 'optuna.visualization', 'neptune.new', 'neptune_optuna.impl'])
+    return context
+
+
+class _PlotPool:
+    """Renders plots in worker processes, one job per plot type, and uploads only the most recent render of each.
+
+    Every refresh bumps a generation counter. Jobs of older generations are cancelled if they have not started yet,
+    and their results are discarded if they finish after a newer job for the same plot was submitted.
+    """
+
+    def __init__(self, run, processes: int, visualization_backend='plotly', plot_payload='standalone',
+                 cost_model: Optional[_PlotCostModel] = None, stage_timer=None):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._run = run
+        self._visualization_backend = visualization_backend
+        self._plot_payload = plot_payload
+        self._cost_model = cost_model
+        self._stage_timer = stage_timer
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=_plot_process_context())
+        # reentrant, since a future that is already done runs its callback right away in submit()
+        self._lock = threading.RLock()
+        # notified when a job is done with, which is after its plot is uploaded
+        self._jobs_done = threading.Condition(self._lock)
+        self._unfinished_jobs = 0
+        self._generation = 0
+        self._pool_id = uuid.uuid4().hex
+        self._latest = {}
+        self._pending = {}
+
+    def submit(self, study: 'optuna.Study', plot_names: List[str], sampled_trials=None, plot_kwargs=None):
+        # one snapshot of all trials, and one of the sample, shared by the jobs of this refresh
+        snapshots = {}
+        for plot_name in plot_names:
+            sampled = sampled_trials is not None and plot_name in SAMPLED_PLOTS
+            if sampled not in snapshots:
+                snapshots[sampled] = _trials_snapshot(sampled_trials if sampled
+                                                      else study.get_trials(deepcopy=False))
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            for plot_name in plot_names:
+                superseded = self._pending.pop(plot_name, None)
+                if superseded is not None:
+                    superseded.cancel()
+                sampled = sampled_trials is not None and plot_name in SAMPLED_PLOTS
+                future = self._executor.submit(_render_plot_from_snapshot,
+                                               self._visualization_backend, self._plot_payload, plot_name,
+                                               study.study_name, study.directions,
+                                               (self._pool_id, generation, sampled), snapshots[sampled],
+                                               (plot_kwargs or {}).get(plot_name))
+                self._latest[plot_name] = generation
+                self._pending[plot_name] = future
+                self._unfinished_jobs += 1
+                future.add_done_callback(
+                    lambda f, plot_name=plot_name, generation=generation: self._upload(f, plot_name, generation))
+
+    def _upload(self, future, plot_name: str, generation: int):
+        try:
+            self._upload_result(future, plot_name, generation)
+        finally:
+            with self._jobs_done:
+                self._unfinished_jobs -= 1
+                self._jobs_done.notify_all()
+
+    def _upload_result(self, future, plot_name: str, generation: int):
+        if future.cancelled():
+            return
+        with self._lock:
+            superseded = self._latest.get(plot_name) != generation
+            if self._pending.get(plot_name) is future:
+                del self._pending[plot_name]
+        try:
+            plot, seconds = future.result()
+        except Exception as e:
+            warnings.warn(f'NeptuneCallback failed to render {plot_name}: {e!r}')
+            return
+        if superseded:
+            # a newer render of this plot is on its way, only its cost is worth keeping
+            plot = None
+        _log_rendered_plot(self._run, plot_name, plot, seconds, self._cost_model, self._stage_timer)
+
+    def flush(self, timeout=None) -> bool:
+        # the futures are done before their callbacks upload the plots, so the jobs are counted instead
+        with self._jobs_done:
+            return self._jobs_done.wait_for(lambda: self._unfinished_jobs == 0, timeout)
+
+    def close(self, timeout=None) -> bool:
+        done = self.flush(timeout)
+        self._executor.shutdown(wait=done)
+        return done
+
+
+class _BestTrialsTracker:
+    """Keeps the best trials (the Pareto front for multi-objective studies) up to date one trial at a time.
+
+    Each update costs O(size of the front) instead of rescanning all trials of the study.
+    """
+
+    def __init__(self, directions, best_trials: Iterable['optuna.trial.FrozenTrial'] = ()):
+        self._signs = [-1 if d == optuna.study.StudyDirection.MAXIMIZE else 1 for d in directions]
+        self._front = []
+        for trial in best_trials:
+            self.update(trial)
+
+    @property
+    def best_trials(self) -> List['optuna.trial.FrozenTrial']:
+        return sorted(self._front, key=lambda trial: trial.number)
+
+    def update(self, trial: 'optuna.trial.FrozenTrial') -> bool:
+        """Adds the trial to the front unless a trial on it dominates the new one. Returns whether the front changed."""
+        if trial.state != optuna.trial.TrialState.COMPLETE or trial.values is None:
+            return False
+        if any(self._dominates(best, trial) for best in self._front):
+            return False
+        self._front = [best for best in self._front if not self._dominates(trial, best)]
+        self._front.append(trial)
+        return True
+
+    def _dominates(self, a, b):
+        a_values = [sign * value for sign, value in zip(self._signs, a.values)]
+        b_values = [sign * value for sign, value in zip(self._signs, b.values)]
+        return all(x <= y for x, y in zip(a_values, b_values)) and a_values != b_values
+
+
+def _study_best_trials(study: 'optuna.Study') -> List['optuna.trial.FrozenTrial']:
+    """Returns `study.best_trials`, asking the storage for the best trial of a single-objective study.
+
+    optuna computes `best_trials` as the Pareto front of all trials even with a single objective,
+    which reads the whole study out of an RDB storage.
+    """
+    if study._is_multi_objective():
+        return study.best_trials
+    try:
+        return [study.best_trial]
+    except ValueError:
+        return []  # no trial has completed yet
+
+
+def _best_trials_to_dict(best_trials: List['optuna.trial.FrozenTrial']):
+    if not best_trials:
         return dict()
 
-    best_results = {'value': study.best_value,
-                    'params': study.best_params,
-                    'value|params': f'value: {study.best_value}| params: {study.best_params}'}
+    if len(best_trials[0].values) == 1:
+        best_trial = best_trials[0]
+        best_results = {'value': best_trial.value,
+                        'params': best_trial.params,
+                        'value|params': f'value: {best_trial.value}| params: {best_trial.params}'}
+    else:
+        # a multi-objective study has no single best value
+        best_results = {}
 
-    for trial in study.best_trials:
+    for trial in best_trials:
         best_results[f'trials/{trial._trial_id}/datetime_start'] = trial.datetime_start
         best_results[f'trials/{trial._trial_id}/datetime_complete'] = trial.datetime_complete
         best_results[f'trials/{trial._trial_id}/duration'] = trial.duration
         best_results[f'trials/{trial._trial_id}/distributions'] = trial.distributions
         best_results[f'trials/{trial._trial_id}/intermediate_values'] = trial.intermediate_values
         best_results[f'trials/{trial._trial_id}/params'] = trial.params
-        best_results[f'trials/{trial._trial_id}/value'] = trial.value
+        best_results[f'trials/{trial._trial_id}/value'] = _trial_value(trial)
         best_results[f'trials/{trial._trial_id}/values'] = trial.values
 
     return best_results
 
 
-def _log_trials(run, trials: Iterable[optuna.trial.FrozenTrial]):
-    handle = run['trials']
-    for trial in trials:
-        if trial.state.is_finished() and trial.state != optuna.trial.TrialState.COMPLETE:
-            handle[f'trials/{trial._trial_id}/state'] = repr(trial.state)
-
-        if trial.value:
-            handle['values'].log(trial.value, step=trial._trial_id)
+def _log_trials(run, trials: Iterable['optuna.trial.FrozenTrial'], chunk_size: int = TRIALS_CHUNK_SIZE):
+    """Logs the trials in chunks, with one nested assignment and one append per series for each chunk.
 
-        handle['params'].log(trial.params)
-        handle['values|params'].log(f'value: {trial.value}| params: {trial.params}')
-        handle[f'trials/{trial._trial_id}/datetime_start'] = trial.datetime_start
-        handle[f'trials/{trial._trial_id}/datetime_complete'] = trial.datetime_complete
-        handle[f'trials/{trial._trial_id}/duration'] = trial.duration
-        handle[f'trials/{trial._trial_id}/distributions'] = _stringify_keys(trial.distributions)
-        handle[f'trials/{trial._trial_id}/intermediate_values'] = _stringify_keys(trial.intermediate_values)
-        handle[f'trials/{trial._trial_id}/params'] = _stringify_keys(trial.params)
-        handle[f'trials/{trial._trial_id}/value'] = trial.value
-        handle[f'trials/{trial._trial_id}/values'] = trial.values
+    neptune still sends one operation per leaf of the assignment, so this saves the series operations only.
+    """
+    handle = run['trials']
+    for chunk in _chunked(trials, chunk_size):
+        fields = {}
+        values, steps = [], []
+        for trial in chunk:
+            value = _trial_value(trial)
+            trial_fields = {
+                'datetime_start': trial.datetime_start,
+                'datetime_complete': trial.datetime_complete,
+                'duration': trial.duration,
+                'distributions': _stringify_keys(trial.distributions),
+                'intermediate_values': _stringify_keys(trial.intermediate_values),
+                'params': _stringify_keys(trial.params),
+                'value': value,
+                'values': trial.values,
+            }
+            if trial.state.is_finished() and trial.state != optuna.trial.TrialState.COMPLETE:
+                trial_fields['state'] = repr(trial.state)
+            fields[str(trial._trial_id)] = trial_fields
+
+            if value is not None:
+                values.append(value)
+                steps.append(trial._trial_id)
+
+        handle['trials'] = fields
+        _extend_series(handle['values'], values, steps)
+        handle['params'].log([trial.params for trial in chunk])
+        handle['values|params'].log([f'value: {_trial_value(trial)}| params: {trial.params}' for trial in chunk])
+
+
+def _trial_value(trial: 'optuna.trial.FrozenTrial') -> Optional[float]:
+    # `FrozenTrial.value` raises for the trials of a multi-objective study, which have no single value
+    if trial.values is None or len(trial.values) != 1:
+        return None
+    return trial.values[0]
+
+
+def _chunked(iterable: Iterable, chunk_size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _extend_series(handle, values: list, steps: list):
+    if not values:
+        return
+    if hasattr(type(handle), 'extend'):
+        # neptune-client>=1.0.0 appends a batch of values with explicit steps in one call
+        handle.extend(values, steps=steps)
+        return
+    # older clients take a list of values only without steps, and number them on from the last logged step,
+    # so each run of consecutive steps is logged with its first step and then as one list
+    start = 0
+    for end in range(1, len(values) + 1):
+        if end < len(values) and steps[end] == steps[end - 1] + 1:
+            continue
+        handle.log(values[start], step=steps[start])
+        if end - start > 1:
+            handle.log(values[start + 1:end])
+        start = end
 
 
 def _stringify_keys(o):
     return {str(k): _stringify_keys(v) for k, v in o.items()} if isinstance(o, dict) else o
 
 
-def _get_pickle(run: neptune.Run, path: str):
-    import os
-    import tempfile
-    import pickle
+def _get_pickle(run: 'neptune.Run', path: str, cache: Optional['_ArtifactCache'] = None):
+    payload, buffers = _get_artifact(run, path, cache)
+    return pickle.loads(payload, buffers=buffers) if buffers else pickle.loads(payload)
+
+
+def _get_artifact(run: 'neptune.Run', path: str, cache: Optional['_ArtifactCache'] = None) -> Tuple[bytes, list]:
+    """Returns the payload of an artifact and the out-of-band pickle buffers stored with it."""
+    digest, run_id = None, None
+    if cache is not None and run.exists(f'{path}_sha256') and run.exists('sys/id'):
+        digest = run[f'{path}_sha256'].fetch()
+        run_id = run['sys/id'].fetch()
+
+    if digest is None:
+        content = _download(run, path)
+    else:
+        content = cache.get(run_id, digest)
+        if content is None:
+            content = cache.put(run_id, digest, run[path].download)
+    return _decode_artifact(content)
+
+
+def _download(run, path: str) -> bytes:
+    # neptune only downloads files to disk, so stream the artifact into a single temporary file and read it back
+    fd, destination = tempfile.mkstemp(prefix='neptune-optuna-')
+    os.close(fd)
+    try:
+        run[path].download(destination=destination)
+        with open(destination, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(destination)
+
 
-    with tempfile.TemporaryDirectory() as d:
-        run[path].download(destination=d)
-        filepath = os.listdir(d)[0]
-        full_path = os.path.join(d, filepath)
-        with open(full_path, 'rb') as file:
-            artifact = pickle.load(file)
+class _ArtifactCache:
+    """Downloaded artifacts on local disk, addressed by run id and SHA-256, evicting the least recently used.
 
-    return artifact
+    An entry is only written, atomically, once its content matches its hash, so entries are never read partially
+    and their content is trusted. The modification time of an entry marks its last use.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._directory = os.path.expanduser(directory)
+        self._max_bytes = max_bytes
+
+    def get(self, run_id: str, digest: str) -> Optional[bytes]:
+        path = self._path(run_id, digest)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, run_id: str, digest: str, download) -> bytes:
+        path = self._path(run_id, digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, destination = tempfile.mkstemp(prefix=_CACHE_PARTIAL_PREFIX, dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            download(destination=destination)
+            with open(destination, 'rb') as f:
+                content = f.read()
+            if hashlib.sha256(content).hexdigest() == digest:
+                os.replace(destination, path)
+        finally:
+            if os.path.exists(destination):
+                os.remove(destination)
+        self._evict()
+        return content
+
+    def _path(self, run_id: str, digest: str) -> str:
+        return os.path.join(self._directory, run_id.replace(os.sep, '_'), digest)
+
+    def _evict(self):
+        entries = []
+        for directory, _, names in os.walk(self._directory):
+            for name in names:
+                if name.startswith(_CACHE_PARTIAL_PREFIX):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
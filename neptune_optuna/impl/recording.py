@@ -0,0 +1,258 @@
+#
+# Copyright (c) 2021, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+__all__ = [
+    'RecordingRun',
+]
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+_ATOM = 'atom'
+_SERIES = 'series'
+_FILE = 'file'
+
+
+class RecordingRun:
+    """An in-memory stand-in for `neptune.Run` that records what is logged to it instead of sending it anywhere.
+
+    It implements the part of the Run API used by `NeptuneCallback`, `log_study_metadata` and
+    `load_study_from_run`: namespace indexing, assignment (`=`), `log()`, `File` uploads, `fetch()`, `download()`
+    and `exists()`. Every operation is counted together with its payload bytes and the time it took, per attribute
+    path, see `stats()`.
+
+    Args:
+        directory(str, optional): If given, `stop()` dumps everything that was logged into this directory,
+            see `dump()`. Defaults to `None`.
+        run_id(str, optional): Value of 'sys/id'. Defaults to a random id.
+
+    Examples:
+        Log a study offline and see which namespaces cost the most:
+        >>> from neptune_optuna.impl import NeptuneCallback, RecordingRun
+        ... run = RecordingRun()
+        ... study.optimize(objective, n_trials=20, callbacks=[NeptuneCallback(run)])
+        ... run.stats(depth=1)
+    """
+
+    def __init__(self, directory: Optional[str] = None, run_id: Optional[str] = None):
+        self._directory = directory
+        # set up like neptune does, outside of the accounting
+        self._attributes = {'sys/id': (_ATOM, run_id or f'RECORDING-{uuid.uuid4().hex[:8]}')}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, path: str) -> 'RecordingHandler':
+        return RecordingHandler(self, path)
+
+    def __setitem__(self, path: str, value):
+        self[path].assign(value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def exists(self, path: str) -> bool:
+        with self._lock:
+            return path in self._attributes or any(key.startswith(path + '/') for key in self._attributes)
+
+    def wait(self, disk_only=False):
+        pass
+
+    def sync(self, wait=True):
+        pass
+
+    def stop(self, seconds=None):
+        if self._directory is not None:
+            self.dump(self._directory)
+
+    def stats(self, depth: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+        """Returns the number of operations, payload bytes and seconds spent, per attribute path.
+
+        Args:
+            depth(int, optional): If given, paths are aggregated to their first `depth` components,
+                e.g. with depth 1 everything under 'trials/...' is reported as 'trials'. Defaults to `None`.
+        """
+        with self._lock:
+            stats = {}
+            for path, path_stats in self._stats.items():
+                key = '/'.join(path.split('/')[:depth]) if depth is not None else path
+                total = stats.setdefault(key, {'operations': 0, 'bytes': 0, 'seconds': 0.0})
+                for name, value in path_stats.items():
+                    total[name] += value
+            return stats
+
+    def total(self) -> Dict[str, float]:
+        """Returns the number of operations, payload bytes and seconds spent over the whole run."""
+        return self.stats(depth=0).get('', {'operations': 0, 'bytes': 0, 'seconds': 0.0})
+
+    def dump(self, directory: str):
+        """Writes everything that was logged into `directory`.
+
+        Atoms go to 'values.json', series to 'series.json', files to 'files/<path>.<extension>' and the
+        per-path accounting to 'stats.json'.
+        """
+        with self._lock:
+            values, series = {}, {}
+            for path, (kind, payload) in self._attributes.items():
+                if kind == _ATOM:
+                    values[path] = payload
+                elif kind == _SERIES:
+                    series[path] = payload
+                else:
+                    content, extension = payload
+                    file_path = os.path.join(directory, 'files', *path.split('/'))
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(f'{file_path}.{extension}' if extension else file_path, 'wb') as f:
+                        f.write(content)
+            os.makedirs(directory, exist_ok=True)
+            for name, data in (('values', values), ('series', series), ('stats', self._stats)):
+                with open(os.path.join(directory, f'{name}.json'), 'w') as f:
+                    json.dump(data, f, indent=2, default=str)
+
+    def _record(self, path: str, kind: str, payload, payload_bytes: int, start: float):
+        with self._lock:
+            if kind == _SERIES:
+                previous_kind, points = self._attributes.get(path, (_SERIES, []))
+                if previous_kind != _SERIES:
+                    points = []
+                last_step = points[-1][0] if points else -1
+                for step, value in payload:
+                    last_step = step if step is not None else last_step + 1
+                    points.append((last_step, value))
+                payload = points
+            self._attributes[path] = (kind, payload)
+            path_stats = self._stats.setdefault(path, {'operations': 0, 'bytes': 0, 'seconds': 0.0})
+            path_stats['operations'] += 1
+            path_stats['bytes'] += payload_bytes
+            path_stats['seconds'] += time.perf_counter() - start
+
+    def _get(self, path: str):
+        with self._lock:
+            if path in self._attributes:
+                return self._attributes[path]
+            prefix = path + '/' if path else ''
+            children = {key[len(prefix):]: value for key, value in self._attributes.items() if key.startswith(prefix)}
+        if not children:
+            raise KeyError(path)
+        return None, children
+
+
+class RecordingHandler:
+    """The value of `RecordingRun[path]`, mirroring the handler that `neptune.Run[path]` returns."""
+
+    def __init__(self, run: RecordingRun, path: str):
+        self._run = run
+        self._path = path
+
+    def __getitem__(self, path: str) -> 'RecordingHandler':
+        return RecordingHandler(self._run, '/'.join(part for part in (self._path, path) if part))
+
+    def __setitem__(self, path: str, value):
+        self[path].assign(value)
+
+    def assign(self, value, wait=False):
+        if isinstance(value, dict):
+            for key, leaf in value.items():
+                self[str(key)].assign(leaf)
+            return
+        start = time.perf_counter()
+        if _is_file(value):
+            self._upload(value, start)
+        else:
+            self._run._record(self._path, _ATOM, value, _payload_bytes(value), start)
+
+    def upload(self, value, wait=False):
+        start = time.perf_counter()
+        self._upload(value, start)
+
+    def log(self, value, step=None, timestamp=None, wait=False):
+        start = time.perf_counter()
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        steps = [step] + [None] * (len(values) - 1)
+        self._run._record(self._path, _SERIES, list(zip(steps, values)), sum(map(_payload_bytes, values)), start)
+
+    def fetch(self):
+        kind, payload = self._run._get(self._path)
+        if kind == _ATOM:
+            return payload
+        if kind == _SERIES:
+            return payload[-1][1] if payload else None
+        if kind == _FILE:
+            raise TypeError(f"'{self._path}' is a file, use download()")
+        return _unflatten({path: value[1] for path, value in payload.items() if value[0] == _ATOM})
+
+    def fetch_last(self):
+        return self.fetch()
+
+    def fetch_values(self):
+        kind, payload = self._run._get(self._path)
+        if kind != _SERIES:
+            raise TypeError(f"'{self._path}' is not a series")
+        return [{'step': step, 'value': value} for step, value in payload]
+
+    def download(self, destination: Optional[str] = None) -> str:
+        kind, payload = self._run._get(self._path)
+        if kind != _FILE:
+            raise TypeError(f"'{self._path}' is not a file")
+        content, extension = payload
+        destination = destination or os.getcwd()
+        if os.path.isdir(destination):
+            name = self._path.split('/')[-1]
+            destination = os.path.join(destination, f'{name}.{extension}' if extension else name)
+        with open(destination, 'wb') as f:
+            f.write(content)
+        return destination
+
+    def _upload(self, value, start):
+        content = getattr(value, 'content', None)
+        if content is None:
+            with open(value.path, 'rb') as f:
+                content = f.read()
+        elif isinstance(content, str):
+            content = content.encode()
+        extension = getattr(value, 'extension', None) or ''
+        self._run._record(self._path, _FILE, (content, extension), len(content), start)
+
+
+def _is_file(value):
+    return hasattr(value, 'extension') and (hasattr(value, 'content') or hasattr(value, 'path'))
+
+
+def _payload_bytes(value) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    return len(str(value).encode())
+
+
+def _unflatten(values: dict) -> dict:
+    tree = {}
+    for path, value in values.items():
+        *namespaces, name = path.split('/')
+        node = tree
+        for namespace in namespaces:
+            node = node.setdefault(namespace, {})
+        node[name] = value
+    return tree
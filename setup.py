@@ -48,6 +48,11 @@ def main():
         install_requires=base_libs,
         extras_require=extras,
         packages=find_packages(),
+        entry_points={
+            'console_scripts': [
+                'neptune-optuna = neptune_optuna.cli:main',
+            ],
+        },
         cmdclass=versioneer.get_cmdclass(),
         zip_safe=False,
         classifiers=[